@@ -1,15 +1,272 @@
+import ctypes
+import errno
+import hashlib
+import heapq
 import os
 import socket
+import struct
 import sys
 import time
 
 PACKET_SIZE = 1024
 SEQ_ID_SIZE = 4
 MESSAGE_SIZE = PACKET_SIZE - SEQ_ID_SIZE
+# Largest datagram accepted. The senders send PACKET_SIZE-byte datagrams by
+# default; with SENDER_MSS they may send (or, over v2, negotiate) larger ones.
+MAX_DATAGRAM = int(os.environ.get("RECEIVER_MAX_DATAGRAM", "65507"))
 
 TIMEOUT = 5
 FIN_ACK_DELAY = 0.5
 
+# RECEIVER_SERVE=1 keeps the receiver running: it serves any number of
+# senders at once, writes each transfer to its own file (RECEIVER_OUTPUT_FILE
+# with the transfer's name before the extension) and never exits on its own.
+# A transfer with no packets for IDLE_TIMEOUT seconds is closed as it stands.
+SERVE = os.environ.get("RECEIVER_SERVE", "0") == "1"
+IDLE_TIMEOUT = float(os.environ.get("RECEIVER_IDLE_TIMEOUT", str(3 * TIMEOUT)))
+
+# Streaming reassembly flushes in-order bytes as they arrive and only keeps the
+# out-of-order window in memory. RECEIVER_STREAMING=0 restores the old
+# buffer-everything-then-sort behaviour.
+STREAMING = os.environ.get("RECEIVER_STREAMING", "1") != "0"
+REASSEMBLY_WINDOW = int(os.environ.get("RECEIVER_REASSEMBLY_WINDOW", "8192"))
+
+# Number of SACK blocks appended to each ACK (0 = plain cumulative ACKs). Each
+# block is a big-endian (start, end) pair of signed 32-bit byte offsets
+# describing data received above the cumulative ACK. Streaming mode only.
+SACK_BLOCKS = int(os.environ.get("RECEIVER_SACK_BLOCKS", "0"))
+SACK_BLOCK = struct.Struct(">ii")
+
+# Delayed ACKs: acknowledge every Nth in-order segment, or after ACK_DELAY
+# seconds, whichever comes first. Out-of-order, duplicate and gap-filling
+# segments are always ACKed immediately so dupack detection is unaffected.
+# RECEIVER_DELAYED_ACK=1 (the default) ACKs every packet. Streaming mode only.
+DELAYED_ACK = int(os.environ.get("RECEIVER_DELAYED_ACK", "1"))
+ACK_DELAY = float(os.environ.get("RECEIVER_ACK_DELAY", "0.02"))
+
+# Batched socket I/O: drain every queued datagram with one recvmmsg(2) call
+# and send the ACKs for the whole batch with one sendmmsg(2). Linux only;
+# RECEIVER_BATCH_IO=0 (or any other OS) keeps one recvfrom/sendto per packet.
+BATCH_IO = os.environ.get("RECEIVER_BATCH_IO", "1") != "0"
+MAX_BATCH = 64
+ACK_SLOT_SIZE = 512
+
+# Striped transfers (SENDER_FLOWS=K on the sender): each flow first sends
+# seq_id -1 + b"STRIPE" + (transfer id, index, count, start, end) and then
+# sends its byte range from its own address. Streaming mode only.
+CONTROL_SEQ = -1
+STRIPE_TAG = b"STRIPE"
+STRIPE_HEADER = struct.Struct(">IHHii")
+
+# Versioned v2 header (SENDER_WIRE=2 on the sender): 0x80 | version, flags,
+# session id (u32), offset (u64). A session opens with a SYN carrying the
+# options the sender wants (mss, SACK blocks, delayed ACK every N) and, for
+# a striped transfer, its stripe. The SYN|ACK returns what the receiver
+# grants. Packets of unknown sessions are dropped, so stale retransmissions
+# cannot leak into another transfer. ACKs carry u64 SACK blocks. A PROBE,
+# padded to the datagram size a sender is trying, is answered with PROBE|ACK
+# and the number of bytes that arrived, and leaves no state behind.
+V2_MARK = 0x82
+SYN, ACK, FIN, DATA, PROBE = 0x01, 0x02, 0x04, 0x08, 0x10
+V2_HEADER = struct.Struct(">BBIQ")
+SYN_OPTIONS = struct.Struct(">HBB")
+STRIPE_OPTION = struct.Struct(">IHHQQ")
+V2_SACK_BLOCK = struct.Struct(">QQ")
+V2_MAX_MSS = min(MAX_DATAGRAM - V2_HEADER.size, 0xFFFF)
+V2_MAX_SACK_BLOCKS = (ACK_SLOT_SIZE - V2_HEADER.size) // V2_SACK_BLOCK.size
+
+# Every stripe is hashed (SHA-256) as its bytes are written in order. A v2
+# sender puts the digest of its byte range in its EOF FIN, and the output is
+# checked against that; otherwise the payload file is hashed in chunks of
+# HASH_CHUNK bytes. Neither ever holds a whole file in memory.
+HASH_CHUNK = 1 << 20
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+class _sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+
+def _load_mmsg():
+    if not sys.platform.startswith("linux"):
+        return None, None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        recvmmsg, sendmmsg = libc.recvmmsg, libc.sendmmsg
+    except (OSError, AttributeError):
+        return None, None
+    recvmmsg.argtypes = [
+        ctypes.c_int,
+        ctypes.c_void_p,
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_void_p,
+    ]
+    recvmmsg.restype = ctypes.c_int
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return recvmmsg, sendmmsg
+
+
+_recvmmsg, _sendmmsg = _load_mmsg()
+
+
+def _mmsg_arrays(max_batch: int, slot_size: int):
+    """Preallocated buffer, per-slot sockaddrs, iovecs and mmsghdrs."""
+    buf = ctypes.create_string_buffer(slot_size * max_batch)
+    names = (_sockaddr_in * max_batch)()
+    iov = (_iovec * max_batch)()
+    msgs = (_mmsghdr * max_batch)()
+    base = ctypes.addressof(buf)
+    for i in range(max_batch):
+        iov[i].iov_base = base + i * slot_size
+        iov[i].iov_len = slot_size
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.addressof(names[i])
+        hdr.msg_namelen = ctypes.sizeof(_sockaddr_in)
+        hdr.msg_iov = ctypes.pointer(iov[i])
+        hdr.msg_iovlen = 1
+    return buf, names, iov, msgs
+
+
+class DatagramIO:
+    """
+    recv() blocks for one datagram with the socket's normal timeout, then
+    picks up everything else already queued with a single non-blocking
+    recvmmsg(2). send() queues an ACK and flush() pushes the queue out with
+    one sendmmsg(2). Without those calls it degrades to recvfrom()/sendto().
+    Fields the kernel fills in are read through raw memoryviews because
+    ctypes attribute access costs more than the syscalls being saved.
+    """
+
+    def __init__(self, sock: socket.socket, packet_size: int, max_batch: int = MAX_BATCH):
+        self.sock = sock
+        self.packet_size = packet_size
+        self.max_batch = max_batch
+        self.batched = BATCH_IO and _recvmmsg is not None and _sendmmsg is not None
+        self.queued = 0
+        if not self.batched:
+            return
+
+        self._rx_buf, self._rx_names, self._rx_iov, self._rx_msgs = _mmsg_arrays(
+            max_batch, packet_size
+        )
+        self._rx_view = memoryview(self._rx_buf).cast("B")
+        self._rx_msgs_addr = ctypes.addressof(self._rx_msgs)
+        self._rx_words = memoryview(self._rx_msgs).cast("B").cast("I")
+        self._words_per_msg = ctypes.sizeof(_mmsghdr) // 4
+        self._len_word = _mmsghdr.msg_len.offset // 4
+        # The first 8 bytes of a sockaddr_in (family, port, address) read as
+        # one integer are a cheap key for the (host, port) tuple.
+        self._rx_keys = memoryview(self._rx_names).cast("B").cast("Q")
+        self._addr_cache: dict[int, tuple[str, int]] = {}
+
+        self._tx_buf, self._tx_names, self._tx_iov, self._tx_msgs = _mmsg_arrays(
+            max_batch, ACK_SLOT_SIZE
+        )
+        self._tx_view = memoryview(self._tx_buf).cast("B")
+        self._tx_msgs_addr = ctypes.addressof(self._tx_msgs)
+        self._tx_lens = memoryview(self._tx_iov).cast("B").cast("N")
+        self._tx_name_view = memoryview(self._tx_names).cast("B")
+        self._name_cache: dict[tuple[str, int], bytes] = {}
+
+    def recv(self) -> list[tuple[bytes, tuple[str, int]]]:
+        first = self.sock.recvfrom(self.packet_size)
+        if not self.batched:
+            return [first]
+        n = _recvmmsg(
+            self.sock.fileno(), self._rx_msgs_addr, self.max_batch, socket.MSG_DONTWAIT, None
+        )
+        if n <= 0:
+            return [first]
+        batch = [first]
+        view, words, keys, cache = self._rx_view, self._rx_words, self._rx_keys, self._addr_cache
+        stride, len_word, size = self._words_per_msg, self._len_word, self.packet_size
+        for i in range(n):
+            key = keys[2 * i]
+            client = cache.get(key)
+            if client is None:
+                raw = key.to_bytes(8, sys.byteorder)
+                client = (socket.inet_ntoa(raw[4:8]), int.from_bytes(raw[2:4], "big"))
+                cache[key] = client
+            offset = i * size
+            batch.append((bytes(view[offset : offset + words[i * stride + len_word]]), client))
+        return batch
+
+    def send(self, packet: bytes, client: tuple[str, int]) -> None:
+        if not self.batched or len(packet) > ACK_SLOT_SIZE:
+            self.flush()
+            self.sock.sendto(packet, client)
+            return
+        name = self._name_cache.get(client)
+        if name is None:
+            name = (
+                socket.AF_INET.to_bytes(2, sys.byteorder)
+                + client[1].to_bytes(2, "big")
+                + socket.inet_aton(client[0])
+                + bytes(8)
+            )
+            self._name_cache[client] = name
+        i = self.queued
+        offset = i * ACK_SLOT_SIZE
+        self._tx_view[offset : offset + len(packet)] = packet
+        self._tx_lens[2 * i + 1] = len(packet)
+        self._tx_name_view[i * 16 : i * 16 + 16] = name
+        self.queued = i + 1
+        if self.queued == self.max_batch:
+            self.flush()
+
+    def flush(self) -> None:
+        total = self.queued
+        sent = 0
+        while sent < total:
+            n = _sendmmsg(
+                self.sock.fileno(),
+                self._tx_msgs_addr + sent * ctypes.sizeof(_mmsghdr),
+                total - sent,
+                0,
+            )
+            if n <= 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                # Fall back to a regular send for this ACK and carry on
+                offset = sent * ACK_SLOT_SIZE
+                packet = bytes(self._tx_view[offset : offset + self._tx_lens[2 * sent + 1]])
+                name = bytes(self._tx_name_view[sent * 16 : sent * 16 + 16])
+                client = (socket.inet_ntoa(name[4:8]), int.from_bytes(name[2:4], "big"))
+                try:
+                    self.sock.sendto(packet, client)
+                except OSError as e:
+                    print(f"Error sending ACK: {e}")
+                n = 1
+            sent += n
+        self.queued = 0
+
 
 def create_acknowledgement(seq_id, message: str) -> bytes:
     return (
@@ -18,6 +275,362 @@ def create_acknowledgement(seq_id, message: str) -> bytes:
     )
 
 
+def encode_sack_blocks(blocks: list[tuple[int, int]]) -> bytes:
+    return b"".join(SACK_BLOCK.pack(start, end) for start, end in blocks)
+
+
+class AckScheduler:
+    """
+    Counts in-order segments since the last ACK and tracks the deadline of the
+    oldest unacknowledged one. `every` <= 1 turns delaying off.
+    """
+
+    def __init__(self, every: int, max_delay: float):
+        self.every = max(every, 1)
+        self.max_delay = max_delay
+        self.unacked = 0
+        self.deadline: float | None = None
+        self.client = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.every > 1
+
+    @property
+    def poll_interval(self) -> float:
+        return min(self.max_delay, TIMEOUT) if self.enabled else TIMEOUT
+
+    def on_segment(self, client, immediate: bool, now: float) -> bool:
+        """Returns True if an ACK should go out for this segment right away."""
+        self.client = client
+        if immediate or not self.enabled:
+            self.reset()
+            return True
+        self.unacked += 1
+        if self.unacked >= self.every or self.due(now):
+            self.reset()
+            return True
+        if self.deadline is None:
+            self.deadline = now + self.max_delay
+        return False
+
+    def due(self, now: float) -> bool:
+        return self.deadline is not None and now >= self.deadline
+
+    def reset(self) -> None:
+        self.unacked = 0
+        self.deadline = None
+
+
+class StreamingReassembler:
+    """
+    Writes contiguous bytes to the output file as soon as `expected_seq_id`
+    advances. Only segments above the first hole are buffered, and at most
+    `max_buffered` of them; anything beyond that is dropped and left for the
+    sender to retransmit, so memory is bounded by the window, not the file.
+    """
+
+    def __init__(
+        self,
+        output_file: str | None,
+        max_buffered: int = REASSEMBLY_WINDOW,
+        start: int = 0,
+        fd: int | None = None,
+    ):
+        # With `fd`, bytes are written at their absolute offset (one stripe
+        # of a shared output file) instead of appended to output_file.
+        self.output = open(output_file, "wb") if fd is None else None
+        self.fd = fd
+        self.max_buffered = max(max_buffered, 1)
+        self.start = start
+        self.expected_seq_id = start
+        self.sha = hashlib.sha256()
+        self.pending: dict[int, bytes] = {}
+        # Merged byte ranges of the pending segments, indexed from both ends
+        # so inserts and flushes stay O(1). Used to build SACK blocks.
+        self.ranges: dict[int, int] = {}
+        self.range_starts: dict[int, int] = {}
+        self.latest_range: int | None = None
+        self.eof_seq_id: int | None = None
+        self.bytes_written = 0
+        self.unique_sequences = 0
+        self.dropped = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.eof_seq_id is not None and self.expected_seq_id >= self.eof_seq_id
+
+    @property
+    def buffered(self) -> int:
+        return len(self.pending)
+
+    def add(self, seq_id: int, message: bytes) -> bool:
+        """Stores one segment and returns True if it was a duplicate."""
+        if not message:
+            duplicate = self.eof_seq_id == seq_id
+            self.eof_seq_id = seq_id
+            return duplicate
+
+        end = seq_id + len(message)
+        if end <= self.expected_seq_id or seq_id in self.pending:
+            return True
+
+        if seq_id > self.expected_seq_id:
+            if len(self.pending) >= self.max_buffered:
+                self.dropped += 1
+                return False
+            self.pending[seq_id] = message
+            self.unique_sequences += 1
+            self._add_range(seq_id, end)
+            return False
+
+        # seq_id <= expected_seq_id < end: write the part we have not seen yet
+        self.unique_sequences += 1
+        self.latest_range = None
+        self._write(message[self.expected_seq_id - seq_id :])
+        range_end = self.ranges.pop(self.expected_seq_id, None)
+        if range_end is not None:
+            del self.range_starts[range_end]
+        pending = self.pending
+        while pending:
+            chunk = pending.pop(self.expected_seq_id, None)
+            if chunk is None:
+                break
+            self._write(chunk)
+        return False
+
+    def _add_range(self, start: int, end: int) -> None:
+        right_end = self.ranges.pop(end, None)
+        if right_end is not None:
+            del self.range_starts[right_end]
+            end = right_end
+        left_start = self.range_starts.pop(start, None)
+        if left_start is not None:
+            del self.ranges[left_start]
+            start = left_start
+        self.ranges[start] = end
+        self.range_starts[end] = start
+        self.latest_range = start
+
+    def sack_blocks(self, limit: int) -> list[tuple[int, int]]:
+        """
+        Returns up to `limit` out-of-order ranges. As in RFC 2018 the first
+        block is the one holding the most recently received segment; the rest
+        are the lowest ranges, which border the holes the sender needs first.
+        """
+        if limit <= 0 or not self.ranges:
+            return []
+        blocks = []
+        latest = self.latest_range
+        if latest is not None and latest in self.ranges:
+            blocks.append((latest, self.ranges[latest]))
+        for start in heapq.nsmallest(limit, self.ranges):
+            if len(blocks) >= limit:
+                break
+            if start != latest:
+                blocks.append((start, self.ranges[start]))
+        return blocks
+
+    def _write(self, data: bytes) -> None:
+        if self.output is not None:
+            self.output.write(data)
+        else:
+            os.pwrite(self.fd, data, self.expected_seq_id)
+        self.sha.update(data)
+        self.expected_seq_id += len(data)
+        self.bytes_written += len(data)
+
+    def digest(self) -> bytes:
+        return self.sha.digest()
+
+    def finish(self) -> int:
+        if self.output is not None:
+            self.output.close()
+        self.pending.clear()
+        self.ranges.clear()
+        self.range_starts.clear()
+        return self.bytes_written
+
+
+class BufferedReassembler:
+    """
+    Original behaviour: keeps every packet in memory and writes them in
+    sorted order once the transfer ends.
+    """
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.received_data: dict[int, bytes] = {}
+        self.start = 0
+        self.expected_seq_id = 0
+        self.sha = hashlib.sha256()
+        self.bytes_written = 0
+        self.dropped = 0
+
+    @property
+    def complete(self) -> bool:
+        data = self.received_data.get(self.expected_seq_id)
+        return data is not None and len(data) == 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self.received_data)
+
+    @property
+    def unique_sequences(self) -> int:
+        return len(self.received_data)
+
+    def add(self, seq_id: int, message: bytes) -> bool:
+        duplicate = seq_id in self.received_data
+        self.received_data[seq_id] = message
+
+        while self.expected_seq_id in self.received_data:
+            if len(self.received_data[self.expected_seq_id]) == 0:
+                break
+            self.expected_seq_id += len(self.received_data[self.expected_seq_id])
+        return duplicate
+
+    def sack_blocks(self, limit: int) -> list[tuple[int, int]]:
+        return []
+
+    def digest(self) -> bytes:
+        return self.sha.digest()
+
+    def finish(self) -> int:
+        with open(self.output_file, "wb") as f:
+            for sid in sorted(self.received_data.keys()):
+                f.write(self.received_data[sid])
+                self.sha.update(self.received_data[sid])
+                self.bytes_written += len(self.received_data[sid])
+        return self.bytes_written
+
+
+class Transfer:
+    """
+    One transfer into one output file: a single flow, or the `count` flows of
+    a striped transfer, each reassembling its own byte range and writing it
+    at its absolute offset. Done once every flow has sent its FIN/ACK.
+    """
+
+    def __init__(self, name: str, output_file: str, count: int = 1):
+        self.name = name
+        self.output_file = output_file
+        self.count = count
+        self.fd = None
+        if count > 1:
+            self.fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.stripes: dict = {}
+        self.closed: set[int] = set()
+        # SHA-256 of each stripe, as sent by a v2 sender with its EOF
+        self.digests: dict[int, bytes] = {}
+        self.packets_received = 0
+        self.duplicate_packets = 0
+        self.last_activity = time.time()
+
+    @property
+    def striped(self) -> bool:
+        return self.fd is not None
+
+    def open_stripe(self, index: int, start: int = 0):
+        reassembler = self.stripes.get(index)
+        if reassembler is None:
+            if self.striped:
+                reassembler = StreamingReassembler(None, start=start, fd=self.fd)
+            elif STREAMING:
+                reassembler = StreamingReassembler(self.output_file)
+            else:
+                reassembler = BufferedReassembler(self.output_file)
+            self.stripes[index] = reassembler
+        return reassembler
+
+    @property
+    def complete(self) -> bool:
+        return len(self.stripes) == self.count and all(
+            r.complete for r in self.stripes.values()
+        )
+
+    @property
+    def done(self) -> bool:
+        return len(self.closed) == self.count
+
+    @property
+    def unique_sequences(self) -> int:
+        return sum(r.unique_sequences for r in self.stripes.values())
+
+    @property
+    def buffered(self) -> int:
+        return sum(r.buffered for r in self.stripes.values())
+
+    @property
+    def dropped(self) -> int:
+        return sum(r.dropped for r in self.stripes.values())
+
+    def finish(self) -> int:
+        bytes_written = sum(r.finish() for r in self.stripes.values())
+        if self.fd is not None:
+            os.close(self.fd)
+        return bytes_written
+
+
+class Flow:
+    """
+    One sender, known by its address (legacy) or its v2 session: the stripe
+    it feeds, its delayed-ACK scheduler and the options of its session.
+    """
+
+    __slots__ = ("transfer", "index", "reassembler", "acks", "session", "mss", "sack_blocks")
+
+    def __init__(
+        self,
+        transfer: Transfer,
+        index: int,
+        reassembler,
+        session: int | None = None,
+        mss: int = MESSAGE_SIZE,
+        sack_blocks: int = SACK_BLOCKS,
+        delayed_ack: int = DELAYED_ACK,
+    ):
+        self.transfer = transfer
+        self.index = index
+        self.reassembler = reassembler
+        self.session = session
+        self.mss = mss
+        self.sack_blocks = sack_blocks
+        self.acks = AckScheduler(delayed_ack if STREAMING else 1, ACK_DELAY)
+
+    def packet(self, flags: int, offset: int, payload: bytes = b"") -> bytes:
+        return V2_HEADER.pack(V2_MARK, flags, self.session, offset) + payload
+
+    def syn_ack(self) -> bytes:
+        options = SYN_OPTIONS.pack(self.mss, self.sack_blocks, self.acks.every)
+        return self.packet(SYN | ACK, 0, options)
+
+    def acknowledgement(self) -> bytes:
+        reassembler = self.reassembler
+        if self.session is None:
+            return build_acknowledgement(reassembler)
+        blocks = reassembler.sack_blocks(self.sack_blocks)
+        return self.packet(
+            ACK,
+            reassembler.expected_seq_id,
+            b"".join(V2_SACK_BLOCK.pack(start, end) for start, end in blocks),
+        )
+
+    def closing(self) -> tuple[bytes, bytes]:
+        """The final ACK and the FIN that ask the sender for its FIN/ACK."""
+        ack_id = self.reassembler.expected_seq_id
+        if self.session is None:
+            return create_acknowledgement(ack_id, "ack"), create_acknowledgement(ack_id + 3, "fin")
+        return self.packet(ACK, ack_id), self.packet(FIN, ack_id)
+
+
+def build_acknowledgement(reassembler) -> bytes:
+    acknowledgement = create_acknowledgement(reassembler.expected_seq_id, "ack")
+    if SACK_BLOCKS > 0:
+        acknowledgement += encode_sack_blocks(reassembler.sack_blocks(SACK_BLOCKS))
+    return acknowledgement
+
+
 def resolve_payload_path() -> tuple[str, str]:
     payload = (
         os.environ.get("TEST_FILE") or os.environ.get("PAYLOAD_FILE") or "/hdd/file.zip"
@@ -30,90 +643,357 @@ def resolve_payload_path() -> tuple[str, str]:
     return payload, output
 
 
+def output_path(output_file: str, name: str) -> str:
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{name}{ext}"
+
+
+def file_digest(path: str, start: int, length: int) -> bytes:
+    """SHA-256 of `length` bytes of `path` from offset `start`, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(HASH_CHUNK, length))
+            if not chunk:
+                break
+            sha.update(chunk)
+            length -= len(chunk)
+    return sha.digest()
+
+
+def print_summary(transfer: Transfer) -> None:
+    print(f"Total packets received: {transfer.packets_received}")
+    print(f"Duplicate packets: {transfer.duplicate_packets}")
+    print(f"Unique sequences: {transfer.unique_sequences}")
+
+
+def close_transfer(transfer: Transfer, payload_file: str) -> bool:
+    """Closes the output file and checks it against the payload; False if writing failed."""
+    if transfer.dropped:
+        print(f"Dropped {transfer.dropped} packets beyond the reassembly window")
+
+    output_file = transfer.output_file
+    print(f"\nWriting received data to {output_file}...")
+    try:
+        bytes_written = transfer.finish()
+    except Exception as e:
+        print(f"✗ Error writing file: {e}")
+        return False
+
+    print(f"✓ Wrote {bytes_written:,} bytes to {output_file}")
+
+    stripes = transfer.stripes
+    try:
+        if len(transfer.digests) == transfer.count:
+            # the sender vouched for every stripe; the payload file is not needed
+            if all(r.digest() == transfer.digests.get(i) for i, r in stripes.items()):
+                print("✓ File content matches the sender's SHA-256 digest")
+            else:
+                print("✗ File content differs from the sender's SHA-256 digest")
+        elif os.path.exists(payload_file):
+            original_size = os.path.getsize(payload_file)
+            received_size = os.path.getsize(output_file)
+
+            if original_size == received_size:
+                print(f"✓ File size matches original: {original_size:,} bytes")
+                if all(
+                    r.digest() == file_digest(payload_file, r.start, r.bytes_written)
+                    for r in stripes.values()
+                ):
+                    print("✓ File content matches original perfectly!")
+                else:
+                    print("✗ File size matches but content differs")
+            else:
+                print(
+                    f"✗ File size mismatch: original={original_size:,}, received={received_size:,}"
+                )
+    except Exception as e:
+        print(f"Could not verify file: {e}")
+    return True
+
+
 def main():
     receiver_port = int(os.environ.get("RECEIVER_PORT", "5001"))
     payload_file, output_file = resolve_payload_path()
 
     os.makedirs(os.path.dirname(output_file) or "/hdd", exist_ok=True)
 
+    delayed_acks = STREAMING and DELAYED_ACK > 1
+    poll_interval = min(ACK_DELAY, TIMEOUT) if delayed_acks else TIMEOUT
+
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
         udp_socket.bind(("0.0.0.0", receiver_port))
-        udp_socket.settimeout(TIMEOUT)
+        udp_socket.settimeout(poll_interval)
+        datagrams = DatagramIO(udp_socket, MAX_DATAGRAM)
 
         timeouts = 0
         max_consecutive_timeouts = 3
-        packets_received = 0
-        duplicate_packets = 0
         last_activity = time.time()
-        expected_seq_id = 0
-        received_data: dict[int, bytes] = {}
+        next_sweep = last_activity + TIMEOUT
 
         print(f"Receiver running on port {receiver_port}")
-        print(f"Expecting payload: {payload_file} -> writing to {output_file}")
+        if SERVE:
+            print(f"Serving transfers into {output_path(output_file, '<name>')} until interrupted")
+        else:
+            print(f"Expecting payload: {payload_file} -> writing to {output_file}")
+        if STREAMING:
+            print(f"Streaming reassembly (out-of-order window: {REASSEMBLY_WINDOW} packets)")
+            if SACK_BLOCKS > 0:
+                print(f"Selective ACKs enabled (up to {SACK_BLOCKS} blocks per ACK)")
+            if delayed_acks:
+                print(f"Delayed ACKs enabled (every {DELAYED_ACK} segments or {ACK_DELAY}s)")
         print("Waiting for data...")
 
-        while True:
+        # Flows by sender address (legacy) or session id (v2); transfers by
+        # name, which is the transfer id for a striped transfer and the next
+        # number for any other. Without RECEIVER_SERVE there is only ever one
+        # transfer, and it goes to output_file.
+        flows: dict = {}
+        transfers: dict = {}
+        # Addresses and sessions of recently closed transfers, whose stray
+        # retransmissions must not start a new one
+        closed: dict = {}
+        served = 0
+        status = True
+        finished = False
+
+        def new_transfer(name: str | None = None, count: int = 1) -> Transfer:
+            nonlocal served
+            if name is None:
+                served += 1
+                name = f"{served:04d}"
+            transfer = Transfer(name, output_path(output_file, name) if SERVE else output_file, count)
+            transfers[name] = transfer
+            if SERVE:
+                print(f"\nTransfer {name} -> {transfer.output_file}")
+            return transfer
+
+        def striped_transfer(transfer_id: int, count: int) -> Transfer | None:
+            name = f"{transfer_id:08x}"
+            transfer = transfers.get(name)
+            if transfer is None:
+                if transfers and not SERVE:
+                    # a flow of some earlier transfer
+                    return None
+                transfer = new_transfer(name, count)
+                print(f"Striped transfer {name}: {count} flows")
+            return transfer
+
+        def end_transfer(transfer: Transfer) -> None:
+            nonlocal status
+            del transfers[transfer.name]
+            now = time.time()
+            for key in [k for k, f in flows.items() if f.transfer is transfer]:
+                del flows[key]
+                closed[key] = now
+            status = close_transfer(transfer, payload_file) and status
+
+        def open_session(session: int, options: bytes) -> Flow | None:
+            nonlocal delayed_acks
+            if session in closed or len(options) < SYN_OPTIONS.size:
+                return None
+            mss, sack_blocks, delayed_ack = SYN_OPTIONS.unpack_from(options)
+            stripe = options[SYN_OPTIONS.size :]
+            if stripe:
+                if not STREAMING or len(stripe) != STRIPE_OPTION.size:
+                    return None
+                transfer_id, index, count, start, end = STRIPE_OPTION.unpack(stripe)
+                transfer = striped_transfer(transfer_id, count)
+                if transfer is None:
+                    return None
+                print(f"Flow {index}/{count} in session {session:08x}: bytes {start}-{end}")
+            elif transfers and not SERVE:
+                # one transfer per run; this is not it
+                return None
+            else:
+                transfer = new_transfer()
+                index, start = 0, 0
+            flow = flows[session] = Flow(
+                transfer,
+                index,
+                transfer.open_stripe(index, start),
+                session,
+                mss=min(max(mss, 1), V2_MAX_MSS),
+                sack_blocks=min(sack_blocks, V2_MAX_SACK_BLOCKS) if STREAMING else 0,
+                delayed_ack=max(delayed_ack, 1),
+            )
+            if flow.acks.enabled and not delayed_acks:
+                # wake up in time to send held-back ACKs
+                delayed_acks = True
+                udp_socket.settimeout(min(ACK_DELAY, TIMEOUT))
+            return flow
+
+        def close_flow(flow: Flow, client) -> bool:
+            """The flow's FIN/ACK arrived; True once a one-shot receiver is done."""
+            transfer = flow.transfer
+            transfer.closed.add(flow.index)
+            if not transfer.done:
+                return False
+            if transfer.striped:
+                print(f"\nReceived FIN/ACK from all {transfer.count} flows")
+            else:
+                print(f"\nReceived FIN/ACK from sender at {client}")
+            print_summary(transfer)
+            if SERVE:
+                end_transfer(transfer)
+                return False
+            return True
+
+        def receive(flow: Flow, client, seq_id: int, message: bytes) -> None:
+            transfer = flow.transfer
+            reassembler = flow.reassembler
+            transfer.last_activity = last_activity
+            transfer.packets_received += 1
+
+            had_gap = reassembler.buffered > 0
+            duplicate = reassembler.add(seq_id, message)
+            if duplicate:
+                transfer.duplicate_packets += 1
+
+            expected_seq_id = reassembler.expected_seq_id
+
+            if transfer.packets_received % 100 == 0:
+                print(
+                    f"Received {transfer.packets_received} packets, Expected seq: {expected_seq_id}, Duplicates: {transfer.duplicate_packets}"
+                )
+
+            immediate = (
+                duplicate
+                or had_gap
+                or reassembler.buffered > 0
+                or seq_id != expected_seq_id - len(message)
+                or reassembler.complete
+            )
+            if flow.acks.on_segment(client, immediate, last_activity):
+                datagrams.send(flow.acknowledgement(), client)
+
+            if not reassembler.complete:
+                return
+
+            for packet in flow.closing():
+                datagrams.send(packet, client)
+            if transfer.striped:
+                # the stripe is in: end this flow like a transfer,
+                # without holding up the others
+                if duplicate:
+                    return
+                print(f"\n✓ Stripe {flow.index} complete at seq {expected_seq_id}")
+                if transfer.complete:
+                    print(f"✓ Transfer complete! All {transfer.count} stripes received")
+                return
+
+            print(f"\n✓ Transfer complete! Expected seq: {expected_seq_id}")
+            print_summary(transfer)
+            if not SERVE:
+                datagrams.flush()
+                time.sleep(FIN_ACK_DELAY)
+
+        while not finished:
             try:
-                packet, client = udp_socket.recvfrom(PACKET_SIZE)
+                batch = datagrams.recv()
                 timeouts = 0
                 last_activity = time.time()
-                packets_received += 1
-
-                seq_id_bytes, message = packet[:SEQ_ID_SIZE], packet[SEQ_ID_SIZE:]
 
-                if message == b"FIN/ACK":
-                    print(f"\nReceived FIN/ACK from sender at {client}")
-                    print(f"Total packets received: {packets_received}")
-                    print(f"Duplicate packets: {duplicate_packets}")
-                    print(f"Unique sequences: {len(received_data)}")
-                    break
+                for packet, client in batch:
+                    if packet and packet[0] == V2_MARK:
+                        if len(packet) < V2_HEADER.size:
+                            continue
+                        _, flags, session, seq_id = V2_HEADER.unpack_from(packet)
+                        if flags & PROBE:
+                            datagrams.send(
+                                V2_HEADER.pack(V2_MARK, PROBE | ACK, session, len(packet)), client
+                            )
+                            continue
+                        message = packet[V2_HEADER.size :]
+                        flow = flows.get(session)
+                        if flags & SYN:
+                            if flow is None:
+                                flow = open_session(session, message)
+                            if flow is not None:
+                                datagrams.send(flow.syn_ack(), client)
+                            continue
+                        if flow is None:
+                            # not a session of ours: left over from an earlier run
+                            continue
+                        if flags & FIN and flags & ACK:
+                            if close_flow(flow, client):
+                                finished = True
+                                break
+                            continue
+                        if flags & FIN:
+                            if message:
+                                flow.transfer.digests[flow.index] = message
+                            message = b""
+                        elif not flags & DATA:
+                            continue
+                        receive(flow, client, seq_id, message)
+                        continue
 
-                seq_id = int.from_bytes(seq_id_bytes, signed=True, byteorder="big")
+                    seq_id_bytes, message = packet[:SEQ_ID_SIZE], packet[SEQ_ID_SIZE:]
+                    flow = flows.get(client)
 
-                if seq_id in received_data:
-                    duplicate_packets += 1
+                    if message == b"FIN/ACK":
+                        if flow is not None and close_flow(flow, client):
+                            finished = True
+                            break
+                        continue
 
-                received_data[seq_id] = message
+                    if flow is None and client in closed:
+                        if last_activity - closed[client] < IDLE_TIMEOUT:
+                            continue
+                        del closed[client]
 
-                while expected_seq_id in received_data:
-                    if len(received_data[expected_seq_id]) == 0:
-                        break
-                    expected_seq_id += len(received_data[expected_seq_id])
+                    seq_id = int.from_bytes(seq_id_bytes, signed=True, byteorder="big")
 
-                if packets_received % 100 == 0:
-                    progress = (
-                        (
-                            expected_seq_id
-                            / (expected_seq_id + len(received_data) * MESSAGE_SIZE)
+                    if seq_id == CONTROL_SEQ:
+                        # a stripe registration, never the start of a transfer
+                        if (
+                            not STREAMING
+                            or not message.startswith(STRIPE_TAG)
+                            or len(message) != len(STRIPE_TAG) + STRIPE_HEADER.size
+                        ):
+                            continue
+                        transfer_id, index, count, start, end = STRIPE_HEADER.unpack_from(
+                            message, len(STRIPE_TAG)
                         )
-                        * 100
-                        if received_data
-                        else 0
-                    )
-                    print(
-                        f"Received {packets_received} packets, Expected seq: {expected_seq_id}, Duplicates: {duplicate_packets}"
-                    )
+                        transfer = striped_transfer(transfer_id, count)
+                        if transfer is None:
+                            continue
+                        if flow is None:
+                            flows[client] = Flow(transfer, index, transfer.open_stripe(index, start))
+                            print(f"Flow {index}/{count} from {client}: bytes {start}-{end}")
+                        datagrams.send(create_acknowledgement(start, "ack"), client)
+                        continue
 
-                ack_id = expected_seq_id
-                acknowledgement = create_acknowledgement(ack_id, "ack")
-                udp_socket.sendto(acknowledgement, client)
+                    if flow is None:
+                        if transfers and not SERVE:
+                            # one transfer, whichever address it comes from
+                            transfer = next(iter(transfers.values()))
+                            if transfer.striped:
+                                continue
+                        else:
+                            transfer = new_transfer()
+                        flow = flows[client] = Flow(transfer, 0, transfer.open_stripe(0))
 
-                if (
-                    expected_seq_id in received_data
-                    and len(received_data[expected_seq_id]) == 0
-                ):
-                    print(f"\n✓ Transfer complete! Expected seq: {expected_seq_id}")
-                    print(f"Total packets received: {packets_received}")
-                    print(f"Duplicate packets: {duplicate_packets}")
-                    print(f"Unique sequences: {len(received_data)}")
+                    receive(flow, client, seq_id, message)
 
-                    ack = create_acknowledgement(ack_id, "ack")
-                    fin = create_acknowledgement(ack_id + 3, "fin")
-                    udp_socket.sendto(ack, client)
-                    udp_socket.sendto(fin, client)
-                    time.sleep(FIN_ACK_DELAY)
+                datagrams.flush()
 
             except socket.timeout:
+                now = time.time()
+                due = False
+                for flow in flows.values():
+                    if flow.acks.due(now):
+                        flow.acks.reset()
+                        datagrams.send(flow.acknowledgement(), flow.acks.client)
+                        due = True
+                if due:
+                    datagrams.flush()
+                    continue
+                if SERVE or (delayed_acks and now - last_activity < TIMEOUT):
+                    continue
+                last_activity = now
                 timeouts += 1
                 print(
                     f"Timeout {timeouts}/{max_consecutive_timeouts} - No packets received for 10s"
@@ -123,59 +1003,46 @@ def main():
                     print(
                         f"\n⚠ No packets for {max_consecutive_timeouts * 10}s, assuming transfer failed or completed"
                     )
-                    print(f"Total packets received: {packets_received}")
-                    print(f"Expected sequence ID: {expected_seq_id}")
-                    print(f"Sequences stored: {len(received_data)}")
-
-                    if (
-                        expected_seq_id in received_data
-                        and len(received_data[expected_seq_id]) == 0
-                    ):
-                        print("✓ Transfer appears complete (have end marker)")
-                    else:
-                        print("✗ Transfer incomplete (missing end marker or data)")
+                    for transfer in transfers.values():
+                        print(f"Total packets received: {transfer.packets_received}")
+                        print(f"Sequences stored: {transfer.buffered}")
+
+                        if transfer.complete:
+                            print("✓ Transfer appears complete (have end marker)")
+                        else:
+                            print("✗ Transfer incomplete (missing end marker or data)")
                     break
 
             except KeyboardInterrupt:
                 print("\n\nReceiver interrupted by user")
-                print(f"Received {packets_received} packets before interruption")
+                for transfer in transfers.values():
+                    print(f"Received {transfer.packets_received} packets of transfer {transfer.name} before interruption")
                 break
 
             except Exception as e:
                 print(f"Error receiving packet: {e}")
+                datagrams.flush()
                 continue
 
-    print(f"\nWriting received data to {output_file}...")
-    try:
-        with open(output_file, "wb") as f:
-            bytes_written = 0
-            for sid in sorted(received_data.keys()):
-                f.write(received_data[sid])
-                bytes_written += len(received_data[sid])
-
-        print(f"✓ Wrote {bytes_written:,} bytes to {output_file}")
-
-        try:
-            if os.path.exists(payload_file):
-                original_size = os.path.getsize(payload_file)
-                received_size = os.path.getsize(output_file)
-
-                if original_size == received_size:
-                    print(f"✓ File size matches original: {original_size:,} bytes")
-                    with open(payload_file, "rb") as f1, open(output_file, "rb") as f2:
-                        if f1.read() == f2.read():
-                            print("✓ File content matches original perfectly!")
-                        else:
-                            print("✗ File size matches but content differs")
-                else:
-                    print(
-                        f"✗ File size mismatch: original={original_size:,}, received={received_size:,}"
-                    )
-        except Exception as e:
-            print(f"Could not verify file: {e}")
+            finally:
+                if SERVE and time.time() >= next_sweep:
+                    # close transfers whose sender went quiet (its FIN/ACK
+                    # lost, or the sender gave up)
+                    now = time.time()
+                    next_sweep = now + TIMEOUT
+                    for transfer in list(transfers.values()):
+                        if now - transfer.last_activity < IDLE_TIMEOUT:
+                            continue
+                        state = "complete" if transfer.complete else "incomplete"
+                        print(f"\n⚠ Transfer {transfer.name} idle for {IDLE_TIMEOUT:.0f}s ({state})")
+                        print_summary(transfer)
+                        end_transfer(transfer)
+                    for client in [c for c, t in closed.items() if now - t >= IDLE_TIMEOUT]:
+                        del closed[client]
 
-    except Exception as e:
-        print(f"✗ Error writing file: {e}")
+    for transfer in list(transfers.values()):
+        end_transfer(transfer)
+    if not status:
         sys.exit(1)
 
     print("\nReceiver exited successfully")
@@ -99,6 +99,22 @@ if errorlevel 1 (
 )
 echo [SUCCESS] Sender file copied
 
+for %%I in ("%SENDER_FILE%") do set "SENDER_DIR=%%~dpI"
+if exist "%SENDER_DIR%transport\" (
+    echo [INFO] Copying shared transport package into container...
+    docker exec %CONTAINER_NAME% rm -rf /app/transport >nul 2>&1
+    docker cp "%SENDER_DIR%transport" %CONTAINER_NAME%:/app/transport >nul 2>&1
+    if errorlevel 1 (
+        echo [ERROR] Failed to copy transport package into container
+        exit /b 1
+    )
+    echo [SUCCESS] Transport package copied
+)
+if exist "%SENDER_DIR%custom_protocol\ml_cwnd_policy.json" (
+    REM exported ML cwnd policy, read by sender_ml_classifier.py
+    docker cp "%SENDER_DIR%custom_protocol\ml_cwnd_policy.json" %CONTAINER_NAME%:/app/ml_cwnd_policy.json >nul 2>&1
+)
+
 echo [INFO] Copying payload into container...
 docker cp "%PAYLOAD_SOURCE%" %CONTAINER_NAME%:%CONTAINER_PAYLOAD_FILE% >nul 2>&1
 if errorlevel 1 (
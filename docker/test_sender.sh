@@ -1,7 +1,9 @@
 #!/bin/bash
 # Unified test script for students to test their sender implementation
 # Usage: ./test_sender.sh <your_sender.py> [payload_file]
-# Optional: NUM_RUNS (env), RECEIVER_PORT (env, default 5001)
+# Optional: NUM_RUNS (env), RECEIVER_PORT (env, default 5001), RECEIVER_SERVE=1 (env,
+# start the receiver once for all runs), SENDERS (env, with RECEIVER_SERVE=1: senders
+# run at once in every run, default 2)
 
 set -euo pipefail
 
@@ -82,19 +84,48 @@ ensure_container_running() {
     fi
 }
 
+RECEIVER_STARTED=0
+
 start_receiver() {
+    if [ "${RECEIVER_SERVE:-0}" = "1" ] && [ "$RECEIVER_STARTED" = "1" ]; then
+        # a serving receiver takes every run, each into its own output file
+        return
+    fi
     print_info "Starting receiver on port $RECEIVER_PORT..."
     docker exec "$CONTAINER_NAME" pkill -f receiver.py >/dev/null 2>&1 || true
     docker exec "$CONTAINER_NAME" rm -f "$CONTAINER_OUTPUT_FILE" >/dev/null 2>&1 || true
+    # Forward any RECEIVER_* options (e.g. RECEIVER_SACK_BLOCKS) from the host
+    local receiver_env=()
+    while IFS= read -r var; do
+        receiver_env+=("$var")
+    done < <(env | grep -E '^RECEIVER_[A-Z_]+=' || true)
     docker exec -d "$CONTAINER_NAME" env \
+        "${receiver_env[@]}" \
         RECEIVER_PORT="$RECEIVER_PORT" \
         TEST_FILE="$CONTAINER_PAYLOAD_FILE" \
         PAYLOAD_FILE="$CONTAINER_PAYLOAD_FILE" \
         RECEIVER_OUTPUT_FILE="$CONTAINER_OUTPUT_FILE" \
         python3 /app/receiver.py >/dev/null
+    RECEIVER_STARTED=1
     sleep 2
 }
 
+run_sender() {
+    # Forward the sender options (SENDER_*, VEGAS_*, ML_INTERVAL, ML_BATCH)
+    # set on the host; ML_POLICY_FILE is a host path, and the policy is
+    # copied to where the sender looks by default
+    local sender_env=()
+    while IFS= read -r var; do
+        sender_env+=(-e "$var")
+    done < <(env | grep -E '^(SENDER_[A-Z_]+|VEGAS_[A-Z_]+|ML_INTERVAL|ML_BATCH)=' || true)
+    docker exec \
+        ${sender_env[@]+"${sender_env[@]}"} \
+        -e RECEIVER_PORT="$RECEIVER_PORT" \
+        -e TEST_FILE="$CONTAINER_PAYLOAD_FILE" \
+        -e PAYLOAD_FILE="$CONTAINER_PAYLOAD_FILE" \
+        "$CONTAINER_NAME" python3 /app/sender.py >"$1" 2>&1
+}
+
 if [ $# -eq 0 ]; then
     print_error "No sender file specified"
     echo "Usage: ./test_sender.sh <your_sender.py> [payload_file]"
@@ -107,6 +138,15 @@ PAYLOAD_ARG=${2:-file.zip}
 NUM_RUNS="${NUM_RUNS:-10}"              # default 10 runs
 RECEIVER_PORT="${RECEIVER_PORT:-5001}"  # default receiver port
 
+if [ "${RECEIVER_SERVE:-0}" = "1" ]; then
+    SENDERS="${SENDERS:-2}"             # concurrent senders per run
+else
+    if [ "${SENDERS:-1}" != "1" ]; then
+        print_warning "SENDERS needs RECEIVER_SERVE=1; running one sender at a time"
+    fi
+    SENDERS=1
+fi
+
 if [ ! -f "$SENDER_FILE" ]; then
     print_error "Sender file '$SENDER_FILE' not found"
     exit 1
@@ -128,6 +168,9 @@ print_header "ECS 152A - Testing Your Sender Implementation"
 print_info "Sender file: $SENDER_FILE"
 print_info "Payload file: $PAYLOAD_SOURCE (copied as $CONTAINER_PAYLOAD_FILE)"
 print_info "Number of runs: $NUM_RUNS"
+if [ "$SENDERS" -gt 1 ]; then
+    print_info "Concurrent senders per run: $SENDERS"
+fi
 print_info "Receiver port (inside container): $RECEIVER_PORT"
 
 # -------------------------------
@@ -166,6 +209,18 @@ if [ ${PIPESTATUS[0]} -ne 0 ]; then
 fi
 print_success "Sender file copied"
 
+SENDER_DIR="$(cd "$(dirname "$SENDER_FILE")" && pwd)"
+if [ -d "$SENDER_DIR/transport" ]; then
+    print_info "Copying shared transport package into container as /app/transport..."
+    docker exec "$CONTAINER_NAME" rm -rf /app/transport >/dev/null 2>&1 || true
+    docker cp "$SENDER_DIR/transport" "$CONTAINER_NAME":/app/transport >/dev/null
+    print_success "Transport package copied"
+fi
+if [ -f "$SENDER_DIR/custom_protocol/ml_cwnd_policy.json" ]; then
+    # exported ML cwnd policy, read by sender_ml_classifier.py
+    docker cp "$SENDER_DIR/custom_protocol/ml_cwnd_policy.json" "$CONTAINER_NAME":/app/ml_cwnd_policy.json >/dev/null
+fi
+
 print_info "Copying payload ($PAYLOAD_BASENAME) into container..."
 docker cp "$PAYLOAD_SOURCE" "$CONTAINER_NAME:$CONTAINER_PAYLOAD_FILE" >/dev/null
 print_success "Payload ready inside container"
@@ -184,34 +239,51 @@ for ((run = 1; run <= NUM_RUNS; run++)); do
     print_info "Executing your sender implementation inside container..."
     echo ""
 
-    set +e
-    SENDER_OUTPUT=$(
-        docker exec \
-            -e RECEIVER_PORT="$RECEIVER_PORT" \
-            -e TEST_FILE="$CONTAINER_PAYLOAD_FILE" \
-            -e PAYLOAD_FILE="$CONTAINER_PAYLOAD_FILE" \
-            "$CONTAINER_NAME" python3 /app/sender.py 2>&1
-    )
-    SENDER_EXIT_CODE=$?
-    set -e
-
-    echo "$SENDER_OUTPUT"
-    echo ""
+    # every sender of a run goes at once; a serving receiver keeps them apart
+    SENDER_LOGS=()
+    SENDER_PIDS=()
+    for ((i = 1; i <= SENDERS; i++)); do
+        SENDER_LOG="$(mktemp)"
+        SENDER_LOGS+=("$SENDER_LOG")
+        run_sender "$SENDER_LOG" &
+        SENDER_PIDS+=($!)
+    done
 
-    if [ $SENDER_EXIT_CODE -ne 0 ]; then
-        print_error "Sender exited with error code $SENDER_EXIT_CODE on run $run"
-        print_warning "Check the output above for error messages"
-        exit 1
-    fi
+    SENDER_FAILED=0
+    for ((i = 0; i < SENDERS; i++)); do
+        set +e
+        wait "${SENDER_PIDS[$i]}"
+        SENDER_EXIT_CODE=$?
+        set -e
+        SENDER_OUTPUT=$(cat "${SENDER_LOGS[$i]}")
+        rm -f "${SENDER_LOGS[$i]}"
+
+        if [ "$SENDERS" -gt 1 ]; then
+            print_info "Sender $((i + 1))/$SENDERS:"
+        fi
+        echo "$SENDER_OUTPUT"
+        echo ""
 
-    METRICS_LINE=$(echo "$SENDER_OUTPUT" \
-        | grep -E '^[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*$' \
-        | tail -n 1)
+        if [ $SENDER_EXIT_CODE -ne 0 ]; then
+            print_error "Sender exited with error code $SENDER_EXIT_CODE on run $run"
+            SENDER_FAILED=1
+            continue
+        fi
 
-    if [ -n "$METRICS_LINE" ]; then
-        ALL_METRICS+="$METRICS_LINE"$'\n'
-    else
-        print_warning "Could not parse metrics on run $run. Skipping this run in averages."
+        METRICS_LINE=$(echo "$SENDER_OUTPUT" \
+            | grep -E '^[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*,[0-9]+\.?[0-9]*$' \
+            | tail -n 1)
+
+        if [ -n "$METRICS_LINE" ]; then
+            ALL_METRICS+="$METRICS_LINE"$'\n'
+        else
+            print_warning "Could not parse metrics on run $run. Skipping this run in averages."
+        fi
+    done
+
+    if [ $SENDER_FAILED -ne 0 ]; then
+        print_warning "Check the output above for error messages"
+        exit 1
     fi
 
     sleep 1
@@ -242,7 +314,11 @@ EOF
 
 IFS=',' read -r THROUGHPUT AVG_DELAY AVG_JITTER SCORE <<<"$AVG_METRICS"
 
-echo "Results (averaged over $NUM_RUNS runs):"
+if [ "$SENDERS" -gt 1 ]; then
+    echo "Results (averaged over $NUM_RUNS runs of $SENDERS concurrent senders):"
+else
+    echo "Results (averaged over $NUM_RUNS runs):"
+fi
 echo "  Throughput:  ${THROUGHPUT} bytes/sec"
 echo "  Avg Delay:   ${AVG_DELAY} sec"
 echo "  Avg Jitter:  ${AVG_JITTER} sec"
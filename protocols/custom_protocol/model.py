@@ -9,6 +9,7 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
+import json
 import pandas as pd
 
 def data_preprocess(df):
@@ -59,6 +60,27 @@ def print_model_equations(model, encoder):
             f"{w[2]:.6f} * throughput "
             f"+ ({b:.6f})")
 
+# sender_ml_classifier.py cannot import sklearn inside the container, so the
+# trained scaler and coefficients are exported as plain JSON for it
+def export_policy(model, scaler, path="ml_cwnd_policy.json"):
+   labels = {0: 'decrease', 1: 'hold', 2: 'increase'}
+   policy = {
+      "model": "multinomial logistic regression (ml_cwnd_model.pkl)",
+      "classes": [labels[int(c)] for c in model.classes_],
+      "features": ["loss", "delay", "throughput"],
+      # units of the Pantheon measurements the model was trained on
+      "feature_units": {"loss": "fraction", "delay": "ms", "throughput": "Mbit/s"},
+      "scaler_mean": scaler.mean_.tolist(),
+      "scaler_scale": scaler.scale_.tolist(),
+      "coef": model.coef_.tolist(),
+      "intercept": model.intercept_.tolist(),
+   }
+   with open(path, "w") as f:
+      json.dump(policy, f, indent=2)
+      f.write("\n")
+
+   print(f"Policy exported to {path}")
+
 def evaluate_model(model, X_test, y_test):
    y_pred = model.predict(X_test)
 
@@ -99,4 +121,7 @@ if __name__ == "__main__":
    print_model_equations(model, encoder)
 
    # Evaluate the model on the test data
-   evaluate_model(model, X_test, y_test)
\ No newline at end of file
+   evaluate_model(model, X_test, y_test)
+
+   # Export the scaler + coefficients for the sender
+   export_policy(model, scaler)
\ No newline at end of file
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3 -u
+
+"""
+BBR-style model-based sender.
+
+Reno, Tahoe and the ML sender only back off after a loss, so on the deep
+netem queues in training_profile.sh they fill the queue first and the delay
+grows to seconds. This sender builds a model of the path instead: the
+bottleneck bandwidth (max delivery rate over the last 10 rounds) and the
+propagation RTT (min RTT over the last 10 s). It paces at gain * bandwidth
+and caps the window at about 2 * bandwidth * min RTT. The gains come from
+BBR's state machine:
+
+- STARTUP: probe with gain 2/ln 2 until the bandwidth stops growing by 25%
+  for three rounds;
+- DRAIN: pace below the bandwidth until the queue built in startup is gone;
+- PROBE_BW: cycle the pacing gain through 1.25, 0.75, then 1 for six RTTs;
+- PROBE_RTT: every 10 s without a new min RTT, shrink to 4 packets for
+  200 ms so the queue empties and the min RTT can be measured again.
+
+Losses are repaired with fast retransmit (SACK holes when the receiver sends
+them) but do not shrink the model.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import sys
+import time
+from typing import List, Optional
+
+from transport.core import HOST, PORT, MSS, CongestionControl, WindowSender, calculate_metrics
+from transport.payload import load_payload
+from transport.rate import DeliveryRateSampler, RateSample, WindowedMax, WindowedMin
+from transport.striping import send_payload
+
+ACK_TIMEOUT = 1.0
+WINDOW_SIZE = 10
+
+HIGH_GAIN = 2 / math.log(2)
+DRAIN_GAIN = 1 / HIGH_GAIN
+CWND_GAIN = 2.0
+PROBE_BW_GAINS = (1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)
+BW_WINDOW_ROUNDS = 10
+MIN_RTT_WINDOW = 10.0
+PROBE_RTT_DURATION = 0.2
+MIN_PIPE_CWND = 4
+FULL_BW_GROWTH = 1.25
+FULL_BW_ROUNDS = 3
+
+STARTUP, DRAIN, PROBE_BW, PROBE_RTT = "startup", "drain", "probe_bw", "probe_rtt"
+
+class bbr(CongestionControl):
+    __slots__ = (
+        "sampler", "btl_bw", "min_rtt", "mode", "pacing_gain", "cwnd_gain",
+        "round_count", "next_round_delivered", "round_start", "full_bw", "full_bw_rounds",
+        "filled_pipe", "cycle_index", "cycle_stamp", "probe_rtt_done", "probe_rtt_round_done",
+        "prior_cwnd", "in_fast_recovery", "in_loss_recovery",
+    )
+
+    initial_cwnd = WINDOW_SIZE
+
+    def __init__(self):
+        super().__init__()
+        self.sampler = DeliveryRateSampler()
+        self.btl_bw = WindowedMax(BW_WINDOW_ROUNDS)
+        self.min_rtt = WindowedMin(MIN_RTT_WINDOW)
+        self.round_count = 0
+        self.next_round_delivered = 0
+        self.round_start = False
+        self.full_bw = 0.0
+        self.full_bw_rounds = 0
+        self.filled_pipe = False
+        self.cycle_index = 0
+        self.cycle_stamp = 0.0
+        self.probe_rtt_done = 0.0
+        self.probe_rtt_round_done = False
+        self.prior_cwnd = 0.0
+        self.in_fast_recovery = False
+        self.in_loss_recovery = False
+        self.enter_startup()
+
+    def bdp(self, gain: float) -> float:
+        """gain * bandwidth * min RTT, in packets."""
+        if not self.btl_bw.best or math.isinf(self.min_rtt.value):
+            return self.initial_cwnd
+        return gain * self.btl_bw.best * self.min_rtt.value
+
+    def enter_startup(self) -> None:
+        self.mode = STARTUP
+        self.pacing_gain = HIGH_GAIN
+        self.cwnd_gain = HIGH_GAIN
+
+    def enter_probe_bw(self, now: float) -> None:
+        self.mode = PROBE_BW
+        self.cwnd_gain = CWND_GAIN
+        # start anywhere but the draining phase
+        self.cycle_index = random.choice([i for i in range(len(PROBE_BW_GAINS)) if i != 1])
+        self.pacing_gain = PROBE_BW_GAINS[self.cycle_index]
+        self.cycle_stamp = now
+
+    def pacing_rate(self, sender: WindowSender) -> Optional[float]:
+        if self.btl_bw.best:
+            return self.pacing_gain * self.btl_bw.best
+        if sender.rtt.srtt:
+            return self.pacing_gain * self.cwnd / sender.rtt.srtt
+        return 0.0
+
+    def on_send(self, sender: WindowSender, idx: int, now: float) -> None:
+        self.sampler.on_send(idx, sender.base, sender.in_flight, now)
+
+    def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+        now = time.time()
+        rs = self.sampler.on_ack(sender.base - newly_acked, sender.base, now)
+        self.update_model(sender, rs, now)
+        if self.in_fast_recovery or self.in_loss_recovery:
+            # debugging
+            # print(f"[EXIT RECOVERY] base={sender.base} cwnd={self.cwnd}")
+            self.in_fast_recovery = False
+            if self.in_loss_recovery and self.mode != PROBE_RTT:
+                self.cwnd = max(self.cwnd, self.prior_cwnd)
+                self.prior_cwnd = 0.0
+            self.in_loss_recovery = False
+        self.update_state(sender, now)
+        self.set_cwnd(newly_acked)
+
+    def update_model(self, sender: WindowSender, rs: Optional[RateSample], now: float) -> None:
+        self.round_start = False
+        if rs is None:
+            return
+        if rs.prior_delivered >= self.next_round_delivered:
+            self.next_round_delivered = self.sampler.delivered
+            self.round_count += 1
+            self.round_start = True
+        self.btl_bw.update(rs.rate, self.round_count)
+        self.min_rtt.update(rs.rtt, now)
+        # debugging
+        # print(f"[SAMPLE] mode={self.mode} rate={rs.rate:.0f} rtt={rs.rtt:.4f} btl_bw={self.btl_bw.best:.0f} min_rtt={self.min_rtt.value:.4f} cwnd={self.cwnd:.1f}")
+
+    def update_state(self, sender: WindowSender, now: float) -> None:
+        if not self.filled_pipe and self.round_start:
+            # the pipe is full once three rounds in a row fail to grow the
+            # bandwidth estimate by 25%
+            if self.btl_bw.best >= self.full_bw * FULL_BW_GROWTH:
+                self.full_bw = self.btl_bw.best
+                self.full_bw_rounds = 0
+            else:
+                self.full_bw_rounds += 1
+                self.filled_pipe = self.full_bw_rounds >= FULL_BW_ROUNDS
+        if self.mode == STARTUP and self.filled_pipe:
+            self.mode = DRAIN
+            self.pacing_gain = DRAIN_GAIN
+            self.cwnd_gain = HIGH_GAIN
+        if self.mode == DRAIN and sender.in_flight <= self.bdp(1.0):
+            self.enter_probe_bw(now)
+        if self.mode == PROBE_BW:
+            self.advance_cycle(sender, now)
+
+        if self.mode != PROBE_RTT and self.min_rtt.stamp and self.min_rtt.expired(now):
+            self.mode = PROBE_RTT
+            self.pacing_gain = 1.0
+            self.cwnd_gain = 1.0
+            self.prior_cwnd = max(self.prior_cwnd, self.cwnd)
+            self.probe_rtt_done = 0.0
+        if self.mode == PROBE_RTT:
+            self.probe_rtt(sender, now)
+
+    def advance_cycle(self, sender: WindowSender, now: float) -> None:
+        elapsed = now - self.cycle_stamp > self.min_rtt.value
+        gain = self.pacing_gain
+        if gain > 1:
+            # keep probing until the extra data is actually in flight
+            done = elapsed and sender.in_flight >= self.bdp(gain)
+        elif gain < 1:
+            # stop draining early once the queue is gone
+            done = elapsed or sender.in_flight <= self.bdp(1.0)
+        else:
+            done = elapsed
+        if done:
+            self.cycle_index = (self.cycle_index + 1) % len(PROBE_BW_GAINS)
+            self.pacing_gain = PROBE_BW_GAINS[self.cycle_index]
+            self.cycle_stamp = now
+
+    def probe_rtt(self, sender: WindowSender, now: float) -> None:
+        if not self.probe_rtt_done:
+            if sender.in_flight <= MIN_PIPE_CWND:
+                # hold the small window for 200 ms and at least one round
+                self.probe_rtt_done = now + PROBE_RTT_DURATION
+                self.probe_rtt_round_done = False
+                self.next_round_delivered = self.sampler.delivered
+            return
+        if self.round_start:
+            self.probe_rtt_round_done = True
+        if self.probe_rtt_round_done and now > self.probe_rtt_done:
+            self.min_rtt.stamp = now
+            self.cwnd = max(self.cwnd, self.prior_cwnd)
+            self.prior_cwnd = 0.0
+            if self.filled_pipe:
+                self.enter_probe_bw(now)
+            else:
+                self.enter_startup()
+
+    def set_cwnd(self, newly_acked: int) -> None:
+        target = self.bdp(self.cwnd_gain) + 2
+        if self.filled_pipe:
+            self.cwnd = min(self.cwnd + newly_acked, target)
+        elif self.cwnd < target or self.sampler.delivered < self.initial_cwnd:
+            self.cwnd += newly_acked
+        self.cwnd = max(self.cwnd, MIN_PIPE_CWND)
+        if self.mode == PROBE_RTT:
+            self.cwnd = min(self.cwnd, MIN_PIPE_CWND)
+
+    def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+        # repair the loss, but leave the model alone
+        if dupacks == 3 and not self.in_fast_recovery:
+            # debugging
+            # print(f"[TRIPLE DUPACK] base={sender.base} cwnd={self.cwnd}")
+            sender.retransmit_lost()
+            self.in_fast_recovery = True
+        elif self.in_fast_recovery:
+            sender.retransmit_lost(restart=False)
+
+    def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+        # as BBR does after an RTO: one packet at a time until the next ACK,
+        # then back to the window from before the timeout
+        if not self.in_loss_recovery:
+            self.prior_cwnd = max(self.prior_cwnd, self.cwnd)
+        self.cwnd = 1
+        self.in_loss_recovery = True
+        self.in_fast_recovery = False
+        sender.go_back_n()
+
+def main() -> None:
+    chunks = load_payload(MSS)
+    total_bytes, duration, delays = send_payload(HOST, PORT, chunks, bbr, ack_timeout=ACK_TIMEOUT, pacing=True)
+    calculate_metrics(total_bytes, duration, delays)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"BBR sender error: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3 -u
+
+"""
+CUBIC sender (RFC 9438), with the same ACK handling and fast retransmit /
+fast recovery as sender_reno.py so the two can be compared run for run.
+
+Reno grows cwnd by 1 / cwnd per ACK, so after each of the 0.2-1.1% random
+losses in training_profile.sh it needs cwnd / 2 round trips to get back.
+CUBIC grows the window as a cubic function of the time since the last
+loss instead:
+
+    W(t) = C * (t - K)^3 + W_max,   K = cbrt(W_max * (1 - beta) / C)
+
+It climbs back to the window where the loss happened (W_max) quickly,
+levels off near it, then probes beyond it. Where that would be slower
+than Reno (short RTTs, small windows), the TCP-friendly estimate W_est sets
+the pace instead. With fast convergence, a flow that loses before reaching
+its previous W_max releases bandwidth by remembering a lower W_max.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import List
+
+from transport.core import HOST, PORT, MSS, CongestionControl, WindowSender, calculate_metrics
+from transport.payload import load_payload
+from transport.striping import send_payload
+
+ACK_TIMEOUT = 1.0
+WINDOW_SIZE = 1
+
+C = 0.4
+BETA = 0.7
+# Reno-equivalent additive increase for a multiplicative decrease of BETA
+ALPHA = 3 * (1 - BETA) / (1 + BETA)
+FAST_CONVERGENCE = True
+
+class cubic(CongestionControl):
+    __slots__ = ("in_fast_recovery", "w_max", "k", "origin", "epoch_start", "w_est")
+
+    initial_cwnd = WINDOW_SIZE
+
+    def __init__(self):
+        super().__init__()
+        self.in_fast_recovery = False
+        self.w_max = 0.0
+        self.k = 0.0
+        self.origin = 0.0
+        self.epoch_start = 0.0
+        self.w_est = 0.0
+
+    def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+        if self.in_fast_recovery:
+            # debugging
+            # print(f"[EXIT FAST RECOVERY] base={sender.base}")
+            self.cwnd = self.ssthresh
+            self.in_fast_recovery = False
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd += newly_acked
+            return
+        self.congestion_avoidance(sender, newly_acked)
+
+    def congestion_avoidance(self, sender: WindowSender, newly_acked: int) -> None:
+        now = time.time()
+        if not self.epoch_start:
+            # first ACK since the last loss (or since slow start ended)
+            self.epoch_start = now
+            self.w_est = self.cwnd
+            if self.cwnd < self.w_max:
+                self.k = ((self.w_max - self.cwnd) / C) ** (1 / 3)
+                self.origin = self.w_max
+            else:
+                self.k = 0.0
+                self.origin = self.cwnd
+        # aim one RTT ahead, as the window set now takes effect an RTT later
+        t = now - self.epoch_start + (sender.rtt.srtt or 0.0)
+        target = self.origin + C * (t - self.k) ** 3
+        target = min(max(target, self.cwnd), 1.5 * self.cwnd)
+
+        self.w_est += ALPHA * newly_acked / self.cwnd
+        if self.w_est > target:
+            # TCP-friendly region: grow at least as fast as Reno would
+            target = self.w_est
+        self.cwnd += (target - self.cwnd) / self.cwnd * newly_acked
+        # debugging
+        # print(f"[CUBIC] t={t:.3f} K={self.k:.3f} W_max={self.w_max:.1f} target={target:.1f} W_est={self.w_est:.1f} cwnd={self.cwnd:.1f}")
+
+    def reduce(self) -> None:
+        if FAST_CONVERGENCE and self.cwnd < self.w_max:
+            self.w_max = self.cwnd * (1 + BETA) / 2
+        else:
+            self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * BETA, 2)
+        self.epoch_start = 0.0
+
+    def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+        if dupacks == 3 and not self.in_fast_recovery:
+            self.reduce()
+            self.cwnd = self.ssthresh + 3
+            # debugging
+            # print(f"[TRIPLE DUPACK] enter fast recovery ssthresh={self.ssthresh} W_max={self.w_max}")
+            sender.retransmit_lost()
+            self.in_fast_recovery = True
+        elif self.in_fast_recovery:
+            self.cwnd += 1
+            sender.retransmit_lost(restart=False)
+
+    def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+        self.reduce()
+        self.cwnd = 1
+        self.in_fast_recovery = False
+        sender.go_back_n()
+
+def main() -> None:
+    chunks = load_payload(MSS)
+    total_bytes, duration, delays = send_payload(HOST, PORT, chunks, cubic, ack_timeout=ACK_TIMEOUT)
+    calculate_metrics(total_bytes, duration, delays)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"CUBIC sender error: {exc}", file=sys.stderr)
+        sys.exit(1)
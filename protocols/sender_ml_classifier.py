@@ -3,233 +3,158 @@
 from __future__ import annotations
 
 import os
-import socket
 import sys
 import time
+from typing import List
 
-from typing import List, Tuple
+from transport.core import HOST, PORT, MSS, CongestionControl, WindowSender, calculate_metrics
+from transport.monitor import MonitorInterval
+from transport.payload import load_payload
+from transport.policy import LinearPolicy
+from transport.striping import send_payload
 
-PACKET_SIZE = 1024
-SEQ_ID_SIZE = 4
-MSS = PACKET_SIZE - SEQ_ID_SIZE
 ACK_TIMEOUT = 1.0
-MAX_TIMEOUTS = 5
 MAX_CWND = 1000
 MIN_CWND = 10
-MAX_RETRIES = 5
-
-HOST = os.environ.get("RECEIVER_HOST", "127.0.0.1")
-PORT = int(os.environ.get("RECEIVER_PORT", "5001"))
-
-class custom_protocol:
-   def __init__(self, host: str, port: int):
-      self.host = host
-      self.port = port
-      self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-      self.socket.settimeout(ACK_TIMEOUT)
-      self.cwnd = 50
-      self.ssthresh = 64
-      self.base = 0
-      self.next_seq = 0
-      self.total_bytes = 0
-      self.delays = []
-      self.timeouts = 0
-      self.last_ack = -1
-      self.dupacks = 0
-      self.in_fast_recovery = False
-      self.send_times = {}
-
-   def send_chunks(self, chunks: List[bytes]):
-      start_time = time.time()
-      total_bytes = sum(len(chunk) for chunk in chunks)
-      while self.base < len(chunks):
-         while self.next_seq < self.base + int(self.cwnd) and self.next_seq < len(chunks):
-            seq_bytes = self.next_seq * MSS
-            pkt = make_packet(seq_bytes, chunks[self.next_seq])
-            self.send_times[seq_bytes] = time.time()
-            self.socket.sendto(pkt, (self.host, self.port))
-            self.total_bytes += len(chunks[self.next_seq])
-            self.next_seq += 1
-         try:
-            ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
-            ack_id, _ = parse_ack(ack_pkt)
-            recv_time = time.time()
-            delay = recv_time - self.send_times.get(ack_id, recv_time)
-            self.delays.append(delay)
-
-            sent_time = self.send_times.get(ack_id, recv_time)
-            delay = recv_time - sent_time
-            self.delays.append(delay)
-
-            if ack_id >= (self.base * MSS):
-               self.base = (ack_id // MSS) + 1
-
-            self.timeouts = 0
-
-            if ack_id == self.last_ack:
-               self.dupacks += 1
-            else:
-               self.dupacks = 0
-               self.in_fast_recovery = False
-            
-            self.last_ack = ack_id
-            
-            throughput = total_bytes / (recv_time - start_time)
-            loss = self.dupacks / max(self.next_seq - self.base, 1)
-            self.cwnd = classify_cwnd(loss, delay, throughput, self.cwnd)
-
-            # Fast transmit for duplicate ACK's
-            if self.dupacks == 3 and not self.in_fast_recovery:
-               self.ssthresh = max(int(self.cwnd / 2), 1)
-               self.cwnd = self.ssthresh + 3
-               missing_idx = ack_id // MSS
-               if missing_idx < len(chunks):
-                  pkt = make_packet(missing_idx * MSS, chunks[missing_idx])
-                  self.send_times[missing_idx * MSS] = time.time()
-                  self.socket.sendto(pkt, (self.host, self.port))
-               self.in_fast_recovery = True
-
-         # Handling timeout
-         except socket.timeout:
-            self.timeouts += 1
-            print("Timeout: Retransmitting...")
-            if self.timeouts >= MAX_TIMEOUTS:
-               break
-            self.ssthresh = max(int(self.cwnd // 2), 2)
-            self.cwnd = MIN_CWND
-            if self.base < len(chunks):
-               seq_bytes = self.base * MSS
-               pkt = make_packet(seq_bytes, chunks[self.base])
-               self.send_times[seq_bytes] = time.time()
-               self.socket.sendto(pkt, (self.host, self.port))
-            self.next_seq = self.base 
-
-      eof_seq = total_bytes
-      eof_pkt = make_packet(eof_seq, b"")
-      retries = 0
-      while retries < MAX_TIMEOUTS:
-            self.socket.sendto(eof_pkt, (self.host, self.port))
-            try:
-               ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
-               ack_id, _ = parse_ack(ack_pkt)
-               if ack_id >= eof_seq:
-                  break
-            except socket.timeout:
-               retries += 1
-
-      duration = time.time() - start_time
-      return self.total_bytes, duration, self.delays
-      
-
-
-def load_payload_chunks() -> List[bytes]:
-   """
-   Reads the selected payload file (or falls back to file.zip) and returns
-   up to two MSS-sized chunks for the demo transfer.
-   """
-   candidates = [
-      os.environ.get("TEST_FILE"),
-      os.environ.get("PAYLOAD_FILE"),
-      "/hdd/file.zip",
-      "file.zip",
-   ]
-
-   for path in candidates:
-      if not path:
-         continue
-      expanded = os.path.expanduser(path)
-      if os.path.exists(expanded):
-         with open(expanded, "rb") as f:
-            data = f.read()
-         break
-   else:
-      print(
-         "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
-         file=sys.stderr,
-      )
-      sys.exit(1)
-   if not data:
-      default = b"DemoPayloadForECS152A" * 100
-      return [default[i:i+MSS] for i in range(0, len(default), MSS)]
-   
-   return [data[i:i+MSS] for i in range(0, len(data), MSS)]
-
-
-def make_packet(seq_id: int, payload: bytes) -> bytes:
-   return int.to_bytes(seq_id, SEQ_ID_SIZE, byteorder="big", signed=True) + payload
-
-
-def parse_ack(packet: bytes) -> Tuple[int, str]:
-   seq = int.from_bytes(packet[:SEQ_ID_SIZE], byteorder="big", signed=True)
-   msg = packet[SEQ_ID_SIZE:].decode(errors="ignore")
-   return seq, msg
-
 
-def calculate_metrics(total_bytes: int, duration: float, delays: List[float]) -> None:
-   throughput = total_bytes / duration if duration > 0 else 0.0
+# How often to make a cwnd decision: "rtt" (once per smoothed RTT, using
+# the loss, RTT and delivery rate measured over it), a number N (every N
+# ACKs), or "ack" (on every ACK, from that ACK alone)
+ML_INTERVAL = os.environ.get("ML_INTERVAL", "rtt")
+# With ML_INTERVAL=ack: decide once per burst of queued ACKs instead
+ML_BATCH = os.environ.get("ML_BATCH", "0") == "1"
 
-   avg_delay = sum(delays) / len(delays) if delays else 0.0
+# The model was trained on Pantheon data: loss as a fraction, delay in ms,
+# throughput in Mbit/s. The sender measures seconds and bytes/sec.
+INPUT_UNITS = (1.0, 1000.0, 8 / 1e6)
 
-   if len(delays) > 1:
-      diffs = [abs(delays[i] - delays[i-1]) for i in range(1, len(delays))]
-      avg_jitter = sum(diffs) / len(diffs)
-   else:
-      avg_jitter = 0.0
 
-   safe_throughput = throughput if throughput > 0 else 1e-9
-   safe_delay = avg_delay if avg_delay > 0 else 1e-9
-   safe_jitter = avg_jitter if avg_jitter > 0 else 1e-9
-
-   metric = (2000 / safe_throughput) + (15 / safe_jitter) + (35 / safe_delay)
-
-   print("\nDemo transfer complete!")
-   print(f"duration={duration:.3f}s throughput={throughput:.2f} bytes/sec")
-   print(f"avg_delay={avg_delay:.6f}s avg_jitter={avg_jitter:.6f}s d") 
-   print(f"{throughput:.7f},{avg_delay:.7f},{avg_jitter:.7f},{metric:.7f}")
-
-
-# Uses equations as hardcoded values from model
-def classify_cwnd(loss, delay, throughput, current_cwnd):
-   # Logistic regression coefficients
-   score_decrease = (-0.076597 * loss +
-                      -0.200254 * delay +
-                      -0.002375 * throughput +
-                      0.893127)
-
-   score_hold = (0.003699 * loss +
-               -0.000245 * delay +
-               0.452747 * throughput +
-               0.084082)
+def find_policy_file() -> str:
+   here = os.path.dirname(os.path.abspath(__file__))
+   candidates = [
+      os.environ.get("ML_POLICY_FILE"),
+      os.path.join(here, "custom_protocol", "ml_cwnd_policy.json"),
+      # test_sender.sh copies it next to /app/sender.py
+      os.path.join(here, "ml_cwnd_policy.json"),
+   ]
+   for path in candidates:
+      if path and os.path.exists(path):
+         return path
+   print(
+      "Could not find ml_cwnd_policy.json (tried ML_POLICY_FILE, custom_protocol/, sender dir)",
+      file=sys.stderr,
+   )
+   sys.exit(1)
 
-   score_increase = (0.072897 * loss +
-                     0.200499 * delay +
-                     -0.450373 * throughput +
-                     -0.977209)
 
-   # Choose the action with the log-odds
-   scores = {
-      "decrease": score_decrease,
-      "hold": score_hold,
-      "increase": score_increase
-   }
+class custom_protocol(CongestionControl):
+   __slots__ = ("in_fast_recovery", "policy", "decrease", "increase", "per_ack",
+                "interval_acks", "monitor", "batch_decisions", "pending", "pending_dupacks")
 
-   best_action = max(scores, key=scores.get)
+   initial_cwnd = 50
 
-   if best_action == "increase":
-      # incremental increase as proportion of current window
-      return min(current_cwnd + (current_cwnd // 10), MAX_CWND)
-   elif best_action == "decrease":
-      return max(current_cwnd - 5, MIN_CWND)  
-   else: 
-      return current_cwnd
+   def __init__(self, policy: LinearPolicy, interval: str = ML_INTERVAL, batch_decisions: bool = ML_BATCH):
+      super().__init__()
+      self.in_fast_recovery = False
+      self.policy = policy
+      self.decrease = policy.classes.index("decrease")
+      self.increase = policy.classes.index("increase")
+      self.per_ack = interval == "ack"
+      self.interval_acks = int(interval) if interval.isdigit() else 0
+      self.monitor = MonitorInterval()
+      self.batch_decisions = batch_decisions
+      self.pending = False
+      self.pending_dupacks = 0
+
+   def classify_cwnd(self, loss: float, delay: float, throughput: float) -> None:
+      action = self.policy.decide((loss, delay, throughput))
+      if action == self.increase:
+         # incremental increase as proportion of current window
+         self.cwnd = min(self.cwnd + (self.cwnd // 10), MAX_CWND)
+      elif action == self.decrease:
+         self.cwnd = max(self.cwnd - 5, MIN_CWND)
+
+   def update_cwnd(self, sender: WindowSender, dupacks: int) -> None:
+      # Model inputs: acknowledged throughput so far, duplicate ACKs relative
+      # to what is in flight, and the latest delay sample. Only this flow's
+      # bytes count: in a striped transfer base starts at its stripe.
+      elapsed = max(time.time() - sender.start_time, 1e-6)
+      throughput = (sender.base * sender.mss - sender.start_bytes) / elapsed
+      loss = dupacks / max(sender.in_flight, 1)
+      self.classify_cwnd(loss, sender.last_delay, throughput)
+
+   def observe(self, sender: WindowSender, dupacks: int) -> None:
+      if self.batch_decisions:
+         self.pending = True
+         self.pending_dupacks = max(self.pending_dupacks, dupacks)
+      else:
+         self.update_cwnd(sender, dupacks)
+
+   def end_interval(self, sender: WindowSender, now: float) -> None:
+      # One decision from everything seen during the interval: windowed loss,
+      # average RTT and delivery rate
+      m = self.monitor
+      self.classify_cwnd(m.loss(sender), m.avg_rtt, m.delivery_rate(now, sender.mss))
+      # debugging
+      # print(f"[INTERVAL] acks={m.acks} loss={m.loss(sender):.4f} min_rtt={m.rtt_min:.4f} avg_rtt={m.avg_rtt:.4f} rate={m.delivery_rate(now, sender.mss):.0f} cwnd={self.cwnd}")
+      m.begin(sender, now)
+
+   def on_ack_burst(self, sender: WindowSender) -> None:
+      if self.per_ack:
+         if self.pending:
+            self.update_cwnd(sender, self.pending_dupacks)
+            self.pending = False
+            self.pending_dupacks = 0
+         return
+      m = self.monitor
+      if m.start == 0.0:
+         m.begin(sender, sender.start_time)
+      if self.interval_acks:
+         done = m.acks >= self.interval_acks
+      else:
+         now = time.time()
+         done = m.acks > 0 and now - m.start >= (sender.rtt.srtt or sender.rtt.rto)
+      if done:
+         self.end_interval(sender, time.time())
+
+   def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+      self.in_fast_recovery = False
+      if self.per_ack:
+         self.observe(sender, 0)
+      else:
+         self.monitor.on_ack(newly_acked, sender.last_delay)
+
+   def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+      if self.per_ack:
+         self.observe(sender, dupacks)
+      else:
+         self.monitor.on_dupack()
+
+      # Fast transmit for duplicate ACK's
+      if dupacks == 3 and not self.in_fast_recovery:
+         self.ssthresh = max(int(self.cwnd / 2), 1)
+         self.cwnd = self.ssthresh + 3
+         sender.retransmit_lost()
+         self.in_fast_recovery = True
+
+   # Handling timeout
+   def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+      print("Timeout: Retransmitting...")
+      self.ssthresh = max(int(self.cwnd // 2), 2)
+      self.cwnd = MIN_CWND
+      # go back N: the next window fill resends from base
+      sender.go_back_n()
+      if not self.per_ack:
+         # start measuring afresh after the stall
+         self.monitor.begin(sender, time.time())
 
 
 def main() -> None:
-   chunks = load_payload_chunks()
-   sender = custom_protocol(HOST, PORT)
-   total_bytes, duration, delays = sender.send_chunks(chunks)
+   policy = LinearPolicy.from_file(find_policy_file(), INPUT_UNITS)
+   chunks = load_payload(MSS)
+   total_bytes, duration, delays = send_payload(HOST, PORT, chunks, lambda: custom_protocol(policy), ack_timeout=ACK_TIMEOUT)
    calculate_metrics(total_bytes, duration, delays)
-   
+
 
 if __name__ == "__main__":
    try:
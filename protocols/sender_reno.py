@@ -2,222 +2,81 @@
 
 from __future__ import annotations
 
-import os
-import socket
 import sys
-import time
-import struct
-from typing import List, Tuple
+from typing import List
+
+from transport.core import HOST, PORT, MSS, CongestionControl, WindowSender, calculate_metrics
+from transport.payload import load_payload
+from transport.striping import send_payload
 
-PACKET_SIZE = 1024
-SEQ_ID_SIZE = 4
-MSS = PACKET_SIZE - SEQ_ID_SIZE
 ACK_TIMEOUT = 1.0
-MAX_TIMEOUTS = 5
-TIMEOUT = 1.0
 WINDOW_SIZE = 1
 
-HOST = os.environ.get("RECEIVER_HOST", "127.0.0.1")
-PORT = int(os.environ.get("RECEIVER_PORT", "5001"))
-
-def load_payload_chunks() -> List[bytes]:
-    candidates = [
-        os.environ.get("TEST_FILE"),
-        os.environ.get("PAYLOAD_FILE"),
-        "/hdd/file.zip",
-        "file.zip",
-    ]
-    for path in candidates:
-        if not path:
-            continue
-        expanded = os.path.expanduser(path)
-        if os.path.exists(expanded):
-            with open(expanded, "rb") as f:
-                data = f.read()
-            break
-    else:
-        print("Could not find payload file", file=sys.stderr)
-        sys.exit(1)
-
-    if not data:
-        default = b"DemoPayloadForECS152A" * 100
-        return [default[i:i+MSS] for i in range(0, len(default), MSS)]
+class reno(CongestionControl):
+    """
+    TCP Reno with NewReno (RFC 6582) fast recovery. `recover` is next_seq
+    when recovery started. An ACK below it is partial: the window had more
+    than one loss, so the next hole is resent at once, and recovery goes on
+    until everything sent before the loss is acknowledged. Reno would exit
+    on the first new ACK and leave every further hole to a timeout.
+    """
 
-    return [data[i:i+MSS] for i in range(0, len(data), MSS)]
+    __slots__ = ("in_fast_recovery", "recover")
 
-def make_packet(seq_id: int, payload: bytes) -> bytes:
-    return int.to_bytes(seq_id, SEQ_ID_SIZE, byteorder="big", signed=True) + payload
+    initial_cwnd = WINDOW_SIZE
 
-def parse_ack(packet: bytes) -> Tuple[int, str]:
-    seq = int.from_bytes(packet[:SEQ_ID_SIZE], byteorder="big", signed=True)
-    msg = packet[SEQ_ID_SIZE:].decode(errors="ignore")
-    return seq, msg
-
-def calculate_metrics(total_bytes: int, duration: float, delays: List[float]) -> None:
-    throughput = total_bytes / duration if duration > 0 else 0.0
-    avg_delay = sum(delays) / len(delays) if delays else 0.0
-    if len(delays) > 1:
-        diffs = [abs(delays[i] - delays[i-1]) for i in range(1, len(delays))]
-        avg_jitter = sum(diffs) / len(diffs)
-    else:
-        avg_jitter = 0.0
-    safe_t = throughput if throughput > 0 else 1e-9
-    safe_d = avg_delay if avg_delay > 0 else 1e-9
-    safe_j = avg_jitter if avg_jitter > 0 else 1e-9
-    metric = (2000 / safe_t) + (15 / safe_j) + (35 / safe_d)
-    
-    print("\nTransfer complete!")
-    print(f"duration={duration:.3f}s throughput={throughput:.2f} bytes/sec")
-    print(f"avg_delay={avg_delay:.6f}s avg_jitter={avg_jitter:.6f}s")
-    print(f"{throughput:.7f},{avg_delay:.7f},{avg_jitter:.7f},{metric:.7f}")
-
-class reno:
-    def __init__(self, host: str, port: int):
-        self.host = host
-        self.port = port
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.settimeout(ACK_TIMEOUT)
-        self.cwnd = WINDOW_SIZE
-        self.ssthresh = 64
-        self.base = 0
-        self.next_seq = 0
-        self.total_bytes = 0
-        self.delays = []
-        self.timeouts = 0
-        self.last_ack = -1
-        self.dupacks = 0
+    def __init__(self):
+        super().__init__()
         self.in_fast_recovery = False
-        self.send_times = {}
-
-    def send_chunks(self, chunks: List[bytes]):
-        start_time = time.time()
-        total_bytes = sum(len(c) for c in chunks)
+        self.recover = 0
 
-        while self.base < len(chunks):
-            while self.next_seq < self.base + int(self.cwnd) and self.next_seq < len(chunks):
-                seq_bytes = self.next_seq * MSS
-                pkt = make_packet(seq_bytes, chunks[self.next_seq])
-                self.send_times[seq_bytes] = time.time()
-                self.socket.sendto(pkt, (self.host, self.port))
-                self.total_bytes += len(chunks[self.next_seq])
+    def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+        if self.in_fast_recovery:
+            if sender.base < self.recover:
+                # partial ACK: deflate by what left the network, and resend
+                # the next segment the receiver is missing
                 # debugging
-                # print(f"[SEND] seq={seq_bytes} cwnd={self.cwnd} base={self.base}")
-                # sys.stdout.flush()
-                self.next_seq += 1
-
-            try:
-                ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
-                ack_id, _ = parse_ack(ack_pkt)
-                recv_time = time.time()
-                delay = recv_time - self.send_times.get(ack_id, recv_time)
-                self.delays.append(delay)
-                # debugging
-                # print(f"[ACK RECEIVED] ack_id={ack_id} delay={delay:.6f}s")
-                # sys.stdout.flush()
-
-                if ack_id == self.last_ack:
-                    self.dupacks += 1
-                else:
-                    self.dupacks = 0
-                self.last_ack = ack_id
-
-                if self.dupacks == 3 and not self.in_fast_recovery:
-                    self.ssthresh = max(int(self.cwnd / 2), 1)
-                    self.cwnd = self.ssthresh + 3
-                    # debugging
-                    # print(f"[TRIPLE DUPACK] enter fast recovery ssthresh={self.ssthresh} cwnd={self.cwnd}")
-                    # sys.stdout.flush()
-                    missing_idx = ack_id // MSS
-                    if missing_idx < len(chunks):
-                        pkt = make_packet(missing_idx * MSS, chunks[missing_idx])
-                        self.socket.sendto(pkt, (self.host, self.port))
-                        # debugging
-                        # print(f"[FAST RETRANSMIT] seq={(missing_idx*MSS)}")
-                        # sys.stdout.flush()
-                    self.in_fast_recovery = True
-                    continue
-
-                if self.in_fast_recovery:
-                    if ack_id // MSS > self.base:
-                        # debugging
-                        # print(f"[EXIT FAST RECOVERY] ack_id={ack_id}")
-                        # sys.stdout.flush()
-                        self.cwnd = self.ssthresh
-                        self.base = (ack_id // MSS) + 1
-                        self.in_fast_recovery = False
-                    else:
-                        self.cwnd += 1
-                        # debugging
-                        # print(f"[FAST RECOVERY INCREASE] cwnd={self.cwnd}")
-                        # sys.stdout.flush()
-                    continue
-
-                if ack_id // MSS >= self.base:
-                    self.base = (ack_id // MSS) + 1
-                    if self.cwnd < self.ssthresh:
-                        self.cwnd += 1
-                    else:
-                        self.cwnd += 1 / self.cwnd
-                    # debugging
-                    # print(f"[NEW ACK] base={self.base} cwnd={self.cwnd}")
-                    # sys.stdout.flush()
-
-                self.timeouts = 0
-
-            except socket.timeout:
-                self.timeouts += 1
-                # debugging
-                # print(f"[TIMEOUT] base={self.base} cwnd={self.cwnd} timeouts={self.timeouts}")
-                # sys.stdout.flush()
-
-                if self.timeouts >= MAX_TIMEOUTS:
-                    # debugging
-                    # print("[MAX TIMEOUTS REACHED] stopping transmission")
-                    #sys.stdout.flush()
-                    break
-
-                self.ssthresh = max(int(self.cwnd / 2), 1)
-                self.cwnd = 1
-
-                if self.base < len(chunks):
-                    seq_bytes = self.base * MSS
-                    pkt = make_packet(seq_bytes, chunks[self.base])
-                    self.socket.sendto(pkt, (self.host, self.port))
-                    # debugging
-                    # print(f"[RETRANSMIT] seq={seq_bytes} due to timeout")
-                    # sys.stdout.flush()
-        eof_seq = total_bytes
-        eof_pkt = make_packet(eof_seq, b"")
-        retries = 0
-
-        while True:
-            self.socket.sendto(eof_pkt, (self.host, self.port))
+                # print(f"[PARTIAL ACK] base={sender.base} recover={self.recover}")
+                self.cwnd = max(self.cwnd - newly_acked + 1, 1)
+                sender.retransmit_first_hole()
+                return
             # debugging
-            # print(f"[SEND EOF] seq={eof_seq}")
-            # sys.stdout.flush()
-            try:
-                ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
-                ack_id, _ = parse_ack(ack_pkt)
-                # debugging
-                # print(f"[ACK RECEIVED EOF] ack_id={ack_id}")
-                # sys.stdout.flush()
-                if ack_id >= eof_seq:
-                    break
-            except socket.timeout:
-                retries += 1
-                # debugging
-                # print(f"[TIMEOUT EOF] retries={retries}")
-                # sys.stdout.flush()
-                if retries > MAX_TIMEOUTS:
-                    break
-
-        duration = time.time() - start_time
-        return self.total_bytes, duration, self.delays
+            # print(f"[EXIT FAST RECOVERY] base={sender.base}")
+            self.cwnd = self.ssthresh
+            self.in_fast_recovery = False
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd += 1
+        else:
+            self.cwnd += 1 / self.cwnd
+
+    def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+        if dupacks == 3 and not self.in_fast_recovery and sender.base >= self.recover:
+            self.recover = sender.next_seq
+            self.ssthresh = max(int(self.cwnd / 2), 1)
+            self.cwnd = self.ssthresh + 3
+            # debugging
+            # print(f"[TRIPLE DUPACK] enter fast recovery ssthresh={self.ssthresh} cwnd={self.cwnd}")
+            sender.retransmit_lost()
+            self.in_fast_recovery = True
+        elif self.in_fast_recovery:
+            self.cwnd += 1
+            sender.retransmit_lost(restart=False)
+
+    def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+        self.ssthresh = max(int(self.cwnd / 2), 1)
+        self.cwnd = 1
+        self.in_fast_recovery = False
+        # dupacks for data sent before the timeout must not start a new
+        # fast retransmit
+        self.recover = sender.next_seq
+        # resend the rest of the window in slow start rather than one
+        # segment per (backed-off) timeout
+        sender.go_back_n()
 
 def main() -> None:
-    chunks = load_payload_chunks()
-    sender = reno(HOST, PORT)
-    total_bytes, duration, delays = sender.send_chunks(chunks)
+    chunks = load_payload(MSS)
+    total_bytes, duration, delays = send_payload(HOST, PORT, chunks, reno, ack_timeout=ACK_TIMEOUT)
     calculate_metrics(total_bytes, duration, delays)
 
 if __name__ == "__main__":
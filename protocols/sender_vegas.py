@@ -0,0 +1,132 @@
+#!/usr/bin/env python3 -u
+
+"""
+TCP Vegas-style delay-based sender.
+
+The score weighs delay and jitter as heavily as throughput. Reno and Tahoe
+only slow down once the 40k-50k packet netem queue overflows, so it is full
+for most of a run. Vegas watches the queue build instead. Once per round
+trip it compares the best RTT ever seen (base RTT, the empty-queue path)
+with the smallest RTT of the last round. The difference is this flow's
+share of the standing queue, in packets:
+
+    diff = cwnd * (1 - base_rtt / rtt)
+
+Below VEGAS_ALPHA packets cwnd grows by one, above VEGAS_BETA it shrinks by
+one, and in between it holds. Slow start ends as soon as diff passes
+VEGAS_GAMMA, before the queue ever fills. The RTT samples come from the
+per-segment send timestamps the core already records (`sender.last_delay`),
+so nothing extra goes on the wire. Like the core's RTO estimate, Vegas only
+uses the samples Karn's rule allows (`sender.rtt_sampled`): an ACK for a
+resent segment may be for the first copy and look far too fast. Losses are
+still repaired with Reno's fast retransmit / fast recovery.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+from typing import List
+
+from transport.core import HOST, PORT, MSS, CongestionControl, WindowSender, calculate_metrics
+from transport.payload import load_payload
+from transport.striping import send_payload
+
+ACK_TIMEOUT = 1.0
+WINDOW_SIZE = 2
+
+# Standing queue (packets) this flow aims to keep in the bottleneck
+VEGAS_ALPHA = float(os.environ.get("VEGAS_ALPHA", "2"))
+VEGAS_BETA = float(os.environ.get("VEGAS_BETA", "4"))
+# Queue (packets) at which slow start stops
+VEGAS_GAMMA = float(os.environ.get("VEGAS_GAMMA", "1"))
+
+class vegas(CongestionControl):
+    __slots__ = ("in_fast_recovery", "alpha", "beta", "gamma", "base_rtt", "round_rtt", "round_end")
+
+    initial_cwnd = WINDOW_SIZE
+
+    def __init__(self, alpha: float = VEGAS_ALPHA, beta: float = VEGAS_BETA, gamma: float = VEGAS_GAMMA):
+        super().__init__()
+        if not 0 <= alpha <= beta:
+            raise ValueError("VEGAS_ALPHA must be between 0 and VEGAS_BETA")
+        self.in_fast_recovery = False
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.base_rtt = math.inf
+        self.round_rtt = math.inf
+        self.round_end = 0
+
+    def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+        rtt = sender.last_delay
+        if sender.rtt_sampled:
+            self.base_rtt = min(self.base_rtt, rtt)
+            # the minimum filters out ACKs delayed by the receiver or by a
+            # retransmission filling a hole
+            self.round_rtt = min(self.round_rtt, rtt)
+        if self.in_fast_recovery:
+            # debugging
+            # print(f"[EXIT FAST RECOVERY] base={sender.base}")
+            self.cwnd = self.ssthresh
+            self.in_fast_recovery = False
+        elif self.cwnd < self.ssthresh:
+            self.cwnd += newly_acked
+        if sender.base >= self.round_end:
+            # every segment sent before this round began is now acknowledged
+            self.end_round()
+            self.round_end = sender.next_seq
+
+    def end_round(self) -> None:
+        rtt = self.round_rtt
+        self.round_rtt = math.inf
+        if math.isinf(rtt) or math.isinf(self.base_rtt):
+            return
+        diff = self.cwnd * (1 - self.base_rtt / rtt)
+        # debugging
+        # print(f"[ROUND] base_rtt={self.base_rtt:.4f} rtt={rtt:.4f} diff={diff:.2f} cwnd={self.cwnd:.1f} ssthresh={self.ssthresh}")
+        if self.cwnd < self.ssthresh:
+            if diff > self.gamma:
+                # leave slow start with the window that just fits the path
+                self.cwnd = max(min(self.cwnd, self.cwnd * self.base_rtt / rtt + 1), 2)
+                self.ssthresh = self.cwnd
+            return
+        if diff < self.alpha:
+            self.cwnd += 1
+        elif diff > self.beta:
+            self.cwnd = max(self.cwnd - 1, 2)
+
+    def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+        if dupacks == 3 and not self.in_fast_recovery:
+            # Vegas backs off less than Reno: the queue is short, so a loss
+            # is more likely random than a sign of overflow
+            self.ssthresh = max(int(self.cwnd * 3 / 4), 2)
+            self.cwnd = self.ssthresh + 3
+            # debugging
+            # print(f"[TRIPLE DUPACK] enter fast recovery ssthresh={self.ssthresh} cwnd={self.cwnd}")
+            sender.retransmit_lost()
+            self.in_fast_recovery = True
+        elif self.in_fast_recovery:
+            self.cwnd += 1
+            sender.retransmit_lost(restart=False)
+
+    def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+        self.ssthresh = max(int(self.cwnd / 2), 2)
+        self.cwnd = 2
+        self.in_fast_recovery = False
+        self.round_rtt = math.inf
+        self.round_end = sender.next_seq
+        sender.go_back_n()
+
+def main() -> None:
+    chunks = load_payload(MSS)
+    total_bytes, duration, delays = send_payload(HOST, PORT, chunks, vegas, ack_timeout=ACK_TIMEOUT)
+    calculate_metrics(total_bytes, duration, delays)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"Vegas sender error: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,6 @@
+"""
+Helpers shared by the sender implementations in protocols/.
+
+test_sender.sh copies this package into the container next to the sender,
+so senders can simply `from transport... import ...`.
+"""
@@ -0,0 +1,148 @@
+"""
+Event-loop transport: the WindowSender on asyncio, for SENDER_ASYNC=1.
+
+WindowSender.send_chunks() fills the window and then blocks in one
+recvfrom(). Its timeout has to cover the next retransmission timer, the next
+paced send and the next ACK at once, and the thread can serve only that one
+flow. AsyncWindowSender runs the same sender as an asyncio DatagramProtocol
+instead, with one callback per event:
+
+- datagram_received() handles an ACK, and any already queued behind it;
+- on_timer() runs when the earliest retransmission deadline or paced send
+  is due, on a loop timer that is re-armed only when it has to move earlier;
+- send_window() fires the expired timers and fills the window after either.
+
+The CongestionControl strategies, SACK scoreboard, RTT estimate and wire
+formats are the WindowSender's own, so every algorithm runs on either
+transport unchanged. Nothing blocks the loop, so a striped transfer runs all
+of its flows as tasks in one thread. Only the handshake (the v2 SYN or the
+stripe registration) and the wait for the payload digest still use blocking
+code, in the loop's executor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from transport.core import WindowSender
+from transport.payload import PayloadSource
+from transport.wire import FIN
+
+ASYNC = os.environ.get("SENDER_ASYNC", "0") == "1"
+
+
+class AsyncWindowSender(WindowSender, asyncio.DatagramProtocol):
+    """A WindowSender driven by asyncio callbacks instead of a blocking loop."""
+
+    __slots__ = ("loop", "transport", "wakeup", "sending", "closing")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.wakeup: Optional[asyncio.TimerHandle] = None
+        # done once every segment is ACKed (or the sender gave up)
+        self.sending: Optional[asyncio.Future] = None
+        # packets that arrive during the EOF/FIN exchange
+        self.closing: Optional[asyncio.Queue] = None
+
+    async def send_chunks_async(self, chunks: PayloadSource, start: int = 0, end: Optional[int] = None):
+        """The coroutine version of send_chunks(), with the same arguments and result."""
+        loop = self.loop = asyncio.get_running_loop()
+        # the v2 handshake blocks, so it runs off the loop
+        digest = await loop.run_in_executor(None, self.start_transfer, chunks, start, end)
+        self.sending = loop.create_future()
+        self.closing = asyncio.Queue()
+        transport, _ = await loop.create_datagram_endpoint(lambda: self, sock=self.socket)
+        # the loop must not wait for socket buffer room: the transport
+        # queues what does not fit and sends it once the socket is writable
+        self.batch.set_queue(transport)
+        try:
+            self.send_window()
+            await self.sending
+            self.timers.clear()
+            if self.wakeup is not None:
+                self.wakeup.cancel()
+                self.wakeup = None
+            payload_digest = await loop.run_in_executor(None, digest.result) if digest is not None else b""
+            await self.finish_async(self.end_bytes, payload_digest)
+        finally:
+            transport.close()
+        duration = time.time() - self.start_time
+        return self.total_bytes, duration, self.metrics
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if self.sending.done():
+            self.closing.put_nowait(data)
+            return
+        try:
+            self.handle_acks(data)
+            self.send_window()
+        except Exception as exc:
+            self.sending.set_exception(exc)
+
+    def on_timer(self) -> None:
+        self.wakeup = None
+        if self.sending.done():
+            return
+        try:
+            self.send_window()
+        except Exception as exc:
+            self.sending.set_exception(exc)
+
+    def send_window(self) -> None:
+        """
+        Fires the expired timers and fills the window, then arms the timer
+        for the next deadline, or ends the sending phase once every segment
+        is ACKed or the oldest one timed out max_timeouts times.
+        """
+        while self.base < self.end:
+            window_end = self.fill_window()
+            now = time.time()
+            if self.fire_timers(now):
+                if self.timeouts >= self.max_timeouts:
+                    break
+                continue
+            self.arm(self.next_wakeup(now, window_end))
+            return
+        self.sending.set_result(None)
+
+    def arm(self, delay: float) -> None:
+        when = self.loop.time() + delay
+        if self.wakeup is not None:
+            if self.wakeup.when() <= when:
+                # it fires first anyway, and on_timer() re-arms
+                return
+            self.wakeup.cancel()
+        self.wakeup = self.loop.call_at(when, self.on_timer)
+
+    async def finish_async(self, eof_seq: int, digest: bytes = b"") -> None:
+        """finish(), waiting on the loop instead of the socket."""
+        eof_acked = False
+        retries = 0
+        eof = self.wire.eof(eof_seq, digest)
+        self.transport.sendto(eof, self.addr)
+        while True:
+            try:
+                ack_pkt = await asyncio.wait_for(self.closing.get(), self.rtt.rto)
+            except asyncio.TimeoutError:
+                retries += 1
+                if eof_acked or retries > self.max_timeouts:
+                    return
+                self.transport.sendto(eof, self.addr)
+                continue
+            ack = self.wire.parse_ack(ack_pkt)
+            if ack is None:
+                continue
+            ack_id, flags, _ = ack
+            if flags & FIN:
+                self.transport.sendto(self.wire.fin_ack(ack_id), self.addr)
+                return
+            if ack_id >= eof_seq:
+                eof_acked = True
@@ -0,0 +1,237 @@
+"""
+Batched datagram sends.
+
+On Linux the window-fill loops hand their packets to a BatchSender, which
+copies them into a preallocated buffer and pushes the whole batch to the
+kernel with one sendmmsg(2) call. Python's socket module does not expose
+sendmmsg, so it is reached through ctypes. Where it is unavailable (macOS,
+Windows, non-IPv4 destinations) BatchSender falls back to one sendto() per
+packet, which is exactly what the senders did before.
+
+send_segment() takes the sequence number and a (memoryview) payload segment
+separately: the header is packed straight into the send buffer next to the
+payload, or handed to sendmsg() as a separate iovec on the fallback path, so
+no per-packet header+payload bytes object is ever built. set_header()
+switches it from the legacy 4-byte offset to a v2 session header.
+
+A blocking sender waits for room when the socket buffer is full. The
+asyncio sender cannot wait, so set_queue() hands what does not fit to its
+transport. The transport queues those datagrams and sends them once the
+socket is writable.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import errno
+import socket
+import struct
+import sys
+from typing import Optional, Tuple
+
+MAX_BATCH = 64
+SEQ_HEADER = struct.Struct(">i")
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+class _sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+
+def _load_sendmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        sendmmsg = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+def _ipv4_sockaddr(addr: Tuple[str, int]) -> Optional[_sockaddr_in]:
+    try:
+        packed = socket.inet_aton(socket.gethostbyname(addr[0]))
+    except OSError:
+        return None
+    sockaddr = _sockaddr_in()
+    sockaddr.sin_family = socket.AF_INET
+    sockaddr.sin_port = socket.htons(addr[1])
+    sockaddr.sin_addr[:] = list(packed)
+    return sockaddr
+
+
+class BatchSender:
+    """
+    Queues datagrams for a single destination and sends them in batches.
+    Call send() for every packet of a window fill, then flush() once.
+    """
+
+    def __init__(self, sock: socket.socket, addr: Tuple[str, int],
+                 slot_size: int = 2048, max_batch: int = MAX_BATCH):
+        self.sock = sock
+        self.addr = addr
+        self.max_batch = max_batch
+        self.slot_size = slot_size
+        self.count = 0
+        self.queue = None
+        self.prefix = b""
+        self.header = SEQ_HEADER
+        self._sockaddr = _ipv4_sockaddr(addr) if _sendmmsg is not None else None
+        self.batched = self._sockaddr is not None and sock.family == socket.AF_INET
+        self._sendmsg = getattr(sock, "sendmsg", None)
+
+        if self.batched:
+            self._allocate(slot_size)
+
+    def _allocate(self, slot_size: int) -> None:
+        max_batch = self.max_batch
+        self.slot_size = slot_size
+        self._arena = ctypes.create_string_buffer(slot_size * max_batch)
+        self._view = memoryview(self._arena).cast("B")
+        self._iov = (_iovec * max_batch)()
+        self._msgs = (_mmsghdr * max_batch)()
+        self._msgs_addr = ctypes.addressof(self._msgs)
+        base = ctypes.addressof(self._arena)
+        name = ctypes.addressof(self._sockaddr)
+        for i in range(max_batch):
+            self._iov[i].iov_base = base + i * slot_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = name
+            hdr.msg_namelen = ctypes.sizeof(_sockaddr_in)
+            hdr.msg_iov = ctypes.pointer(self._iov[i])
+            hdr.msg_iovlen = 1
+        # Writing iov_len through ctypes attribute access costs more than
+        # the syscall we are saving, so poke the lengths through a view.
+        self._iov_len = memoryview(self._iov).cast("B").cast("N")
+
+    def reserve(self, size: int) -> None:
+        """Makes room for `size`-byte datagrams in the batch buffer."""
+        if self.batched and size > self.slot_size:
+            self.flush()
+            self._allocate(size)
+
+    def set_queue(self, queue) -> None:
+        """
+        Hands datagrams the socket has no room for to `queue` (an asyncio
+        DatagramTransport, or None to wait for room again). Until the queue
+        drains, later datagrams go through it too, so they stay in order.
+        """
+        self.flush()
+        self.queue = queue
+
+    def _sendto(self, packet) -> None:
+        if self.queue is not None:
+            self.queue.sendto(packet, self.addr)
+        else:
+            self.sock.sendto(packet, self.addr)
+
+    def send(self, packet: bytes) -> None:
+        if not self.batched or len(packet) > self.slot_size:
+            self.flush()
+            self._sendto(packet)
+            return
+        i = self.count
+        offset = i * self.slot_size
+        self._view[offset:offset + len(packet)] = packet
+        self._iov_len[2 * i + 1] = len(packet)
+        self.count = i + 1
+        if self.count == self.max_batch:
+            self.flush()
+
+    def set_header(self, prefix: bytes, header: struct.Struct) -> None:
+        """Segments become `prefix` + header.pack(seq_id) + payload."""
+        self.flush()
+        self.prefix = prefix
+        self.header = header
+
+    def send_segment(self, seq_id: int, payload) -> None:
+        prefix = self.prefix
+        header_size = len(prefix) + self.header.size
+        size = header_size + len(payload)
+        if not self.batched or size > self.slot_size:
+            self.flush()
+            header = prefix + self.header.pack(seq_id)
+            if self._sendmsg is not None and self.queue is None:
+                self._sendmsg([header, payload], (), 0, self.addr)
+            else:
+                self._sendto(header + bytes(payload))
+            return
+        i = self.count
+        offset = i * self.slot_size
+        if prefix:
+            self._view[offset:offset + len(prefix)] = prefix
+        self.header.pack_into(self._view, offset + len(prefix), seq_id)
+        self._view[offset + header_size:offset + size] = payload
+        self._iov_len[2 * i + 1] = size
+        self.count = i + 1
+        if self.count == self.max_batch:
+            self.flush()
+
+    def flush(self) -> int:
+        """Sends everything queued and returns the number of datagrams."""
+        total = self.count
+        if not total:
+            return 0
+        queue = self.queue
+        if queue is not None and queue.get_write_buffer_size():
+            # datagrams are still waiting for room: queue these behind them
+            self._enqueue(0, total)
+            return total
+        sent = 0
+        fd = self.sock.fileno()
+        while sent < total:
+            n = _sendmmsg(fd, self._msgs_addr + sent * ctypes.sizeof(_mmsghdr), total - sent, 0)
+            if n <= 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                if err not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                    self.count = 0
+                    raise OSError(err, "sendmmsg failed")
+                if queue is not None:
+                    self._enqueue(sent, total)
+                    return total
+                # Socket buffer is full: let sendto() wait for room using the
+                # socket's own timeout, one datagram at a time.
+                offset = sent * self.slot_size
+                self.sock.sendto(self._view[offset:offset + self._iov_len[2 * sent + 1]], self.addr)
+                n = 1
+            sent += n
+        self.count = 0
+        return total
+
+    def _enqueue(self, start: int, end: int) -> None:
+        for i in range(start, end):
+            offset = i * self.slot_size
+            # the batch buffer is reused, so the queue gets a copy
+            self.queue.sendto(bytes(self._view[offset:offset + self._iov_len[2 * i + 1]]), self.addr)
+        self.count = 0
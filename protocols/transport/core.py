@@ -0,0 +1,543 @@
+"""
+Shared transport core for the senders in protocols/.
+
+Packet framing, ACK parsing, socket setup, the send/receive loop, the EOF/FIN
+exchange and metric reporting used to be copy-pasted into every sender.
+They live here once. A WindowSender runs the loop, and each algorithm is a
+CongestionControl strategy that only decides how `cwnd` reacts to new ACKs,
+duplicate ACKs and timeouts, and which segments to resend. A speedup in the
+core helps every algorithm.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import struct
+import time
+from typing import List, Optional, Tuple
+
+from transport.batch_io import BatchSender
+from transport.inflight import InFlight
+from transport.metrics import TransferMetrics, calculate_metrics
+from transport.pacing import PACING, Pacer
+from transport.payload import PayloadSource, RangeDigest
+from transport.rtt import RttEstimator
+from transport.sack import SackScoreboard
+from transport.timers import RetransmitTimers
+from transport.wire import (
+    FIN, LEGACY, V2_HEADER, WIRE, Session, make_syn, new_session_id, parse_syn_ack,
+)
+
+PACKET_SIZE = 1024
+SEQ_ID_SIZE = 4
+ACK_TIMEOUT = 1.0
+MAX_TIMEOUTS = 5
+
+# Payload bytes per segment. By default segments fit a PACKET_SIZE datagram
+# (1010 bytes under the larger v2 header). SENDER_MSS=N sends N-byte
+# segments, which the receiver must take as N + header byte datagrams, and
+# SENDER_MSS=auto probes for the largest datagram the path carries.
+SENDER_MSS = os.environ.get("SENDER_MSS", "")
+PROBE_MSS = SENDER_MSS == "auto"
+MSS = int(SENDER_MSS) if SENDER_MSS.isdigit() else PACKET_SIZE - SEQ_ID_SIZE
+V2_MSS = int(SENDER_MSS) if SENDER_MSS.isdigit() else PACKET_SIZE - V2_HEADER.size
+
+HOST = os.environ.get("RECEIVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("RECEIVER_PORT", "5001"))
+
+SEQ_HEADER = struct.Struct(">i")
+
+
+def make_packet(seq_id: int, payload: bytes) -> bytes:
+    return SEQ_HEADER.pack(seq_id) + payload
+
+
+def parse_ack(packet: bytes) -> Tuple[int, bytes]:
+    """
+    Returns the ACK number and the raw tag that follows it (b"ack", b"fin",
+    possibly followed by SACK blocks). The tag is deliberately not decoded;
+    compare it against bytes.
+    """
+    return SEQ_HEADER.unpack_from(packet)[0], packet[SEQ_ID_SIZE:]
+
+
+def header_size(wire: int) -> int:
+    return V2_HEADER.size if wire >= 2 else SEQ_ID_SIZE
+
+
+def open_socket(timeout: float) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    return sock
+
+
+class CongestionControl:
+    """
+    Strategy interface for WindowSender. `cwnd` is measured in packets; the
+    sender keeps at most int(cwnd) segments in flight. The hooks get the
+    sender so they can read its state and ask for retransmissions.
+    """
+
+    __slots__ = ("cwnd", "ssthresh")
+
+    initial_cwnd: float = 1
+    initial_ssthresh: float = 64
+
+    def __init__(self):
+        self.cwnd = self.initial_cwnd
+        self.ssthresh = self.initial_ssthresh
+
+    def window(self) -> int:
+        return max(int(self.cwnd), 1)
+
+    def pacing_rate(self, sender: WindowSender) -> Optional[float]:
+        """
+        Packets per second to pace at when the sender has a pacer. None (the
+        default) derives the rate from cwnd and SRTT; 0 sends unpaced.
+        """
+        return None
+
+    def on_send(self, sender: WindowSender, idx: int, now: float) -> None:
+        """Segment `idx` is about to be (re)sent."""
+
+    def on_ack(self, sender: WindowSender, newly_acked: int) -> None:
+        """The cumulative ACK advanced by `newly_acked` segments."""
+
+    def on_dupack(self, sender: WindowSender, dupacks: int) -> None:
+        """The same cumulative ACK arrived again (`dupacks` times in a row)."""
+
+    def on_ack_burst(self, sender: WindowSender) -> None:
+        """
+        Every ACK already queued on the socket has been handled (one or more
+        on_ack/on_dupack calls), and the window is about to be refilled.
+        """
+
+    def on_timeout(self, sender: WindowSender, expired: List[int]) -> None:
+        """
+        The retransmission timer of the oldest outstanding segment ran out,
+        along with those of the other `expired` segments. Once this returns,
+        the sender resends those still below next_seq, at most window() of
+        them. It re-arms the rest.
+        """
+
+
+class WindowSender:
+    """
+    Runs a transfer for one CongestionControl strategy. `ack_timeout` is the
+    initial retransmission timeout. After that, each segment's retransmission
+    timer follows the RFC 6298 estimate in `self.rtt`. With `pacing`
+    (SENDER_PACING=1), window fills are spread over the RTT by a Pacer
+    instead of going out back to back. With `wire` 2 (SENDER_WIRE=2) the
+    transfer runs in a v2 session, opened by connect().
+    """
+
+    __slots__ = (
+        "addr", "cc", "max_timeouts", "rtt", "socket", "batch", "scoreboard", "version", "wire", "mss",
+        "timers", "pacer", "chunks", "end", "end_bytes", "base", "next_seq", "total_bytes",
+        "metrics", "last_delay", "rtt_sampled", "timeouts", "last_ack", "dupacks", "outstanding",
+        "segments_sent", "segments_resent", "start_time", "start_bytes",
+    )
+
+    def __init__(self, host: str, port: int, cc: CongestionControl,
+                 ack_timeout: float = ACK_TIMEOUT, max_timeouts: int = MAX_TIMEOUTS,
+                 pacing: bool = PACING, wire: int = WIRE):
+        self.addr = (host, port)
+        self.cc = cc
+        self.max_timeouts = max_timeouts
+        self.rtt = RttEstimator(initial_rto=ack_timeout)
+        self.socket = open_socket(self.rtt.rto)
+        self.batch = BatchSender(self.socket, self.addr)
+        self.scoreboard = SackScoreboard(MSS)
+        self.timers = RetransmitTimers()
+        self.pacer = Pacer() if pacing else None
+        self.version = wire
+        self.wire = LEGACY
+        self.mss = MSS
+        self.chunks: PayloadSource
+        self.end = 0
+        self.end_bytes = 0
+        self.base = 0
+        self.next_seq = 0
+        self.total_bytes = 0
+        self.metrics = TransferMetrics()
+        self.last_delay = 0.0
+        # whether last_delay is a valid RTT sample (Karn's rule)
+        self.rtt_sampled = False
+        self.timeouts = 0
+        self.last_ack = -1
+        self.dupacks = 0
+        self.outstanding = InFlight()
+        self.segments_sent = 0
+        self.segments_resent = 0
+        self.start_time = 0.0
+        self.start_bytes = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self.next_seq - self.base
+
+    def ack_index(self, ack_id: int) -> int:
+        """
+        Maps a cumulative ACK (a byte offset) to the number of segments it
+        fully covers. Every segment but the last is exactly mss bytes, so
+        this is O(1) arithmetic; only the final ACK is not mss-aligned.
+        """
+        if ack_id >= self.end_bytes:
+            return self.end
+        return max(ack_id, 0) // self.mss
+
+    def _send(self, idx: int) -> None:
+        now = time.time()
+        self.segments_sent += 1
+        if self.outstanding.on_send(idx, now):
+            self.segments_resent += 1
+        self.cc.on_send(self, idx, now)
+        self.timers.arm(idx, now + self.rtt.rto)
+        self.batch.send_segment(idx * self.mss, self.chunks[idx])
+
+    def retransmit(self, idx: int) -> None:
+        if idx < self.end:
+            self._send(idx)
+            self.batch.flush()
+
+    def retransmit_holes(self) -> int:
+        """Resends the segments SACK blocks reported missing."""
+        sent = 0
+        for idx in self.scoreboard.holes():
+            if idx >= self.end:
+                break
+            self._send(idx)
+            sent += 1
+        self.batch.flush()
+        return sent
+
+    def retransmit_lost(self, restart: bool = True) -> int:
+        """
+        Resends what the receiver is missing: every SACK hole once the
+        receiver reports blocks, otherwise the first unacknowledged segment.
+        With restart=False (further dupacks during one recovery episode) only
+        newly revealed SACK holes are sent.
+        """
+        if self.scoreboard.active:
+            if restart:
+                self.scoreboard.start_recovery()
+            sent = self.retransmit_holes()
+            if sent or not restart:
+                return sent
+        elif not restart:
+            return 0
+        self.retransmit(self.base)
+        return 1
+
+    def retransmit_first_hole(self) -> int:
+        """
+        NewReno partial ACK: resends the first unacknowledged segment, unless
+        this recovery episode already resent it from the SACK scoreboard,
+        plus any holes newly revealed by SACK blocks.
+        """
+        sent = 0
+        scoreboard = self.scoreboard
+        if not (scoreboard.active and scoreboard.retransmit_cursor > self.base):
+            self.retransmit(self.base)
+            sent = 1
+        if scoreboard.active:
+            sent += self.retransmit_holes()
+        return sent
+
+    def go_back_n(self) -> None:
+        self.timers.cancel_range(self.base, self.next_seq)
+        self.next_seq = self.base
+
+    def connect(self, mss: int, stripe: bytes = b"") -> Session:
+        """
+        Opens a v2 session, offering `mss`-byte segments (and registering a
+        stripe, if given), and retries the SYN until the receiver answers.
+        The round trip also seeds the RTT estimate.
+        """
+        session_id = new_session_id()
+        syn = make_syn(session_id, mss, stripe)
+        self.socket.settimeout(self.rtt.rto)
+        for _ in range(self.max_timeouts):
+            sent_at = time.time()
+            self.socket.sendto(syn, self.addr)
+            try:
+                while True:
+                    session = parse_syn_ack(self.socket.recv(PACKET_SIZE), session_id)
+                    if session is not None:
+                        break
+            except socket.timeout:
+                self.rtt.back_off()
+                self.socket.settimeout(self.rtt.rto)
+                continue
+            self.rtt.sample(time.time() - sent_at)
+            if not 0 < session.mss <= mss:
+                raise ValueError(f"receiver granted an invalid segment size ({session.mss})")
+            self.wire = session
+            self.batch.set_header(session.prefix, session.offset_header)
+            # debugging
+            # print(f"[SESSION] id={session_id:08x} mss={session.mss} sack={session.sack_blocks} delayed_ack={session.delayed_ack}")
+            return session
+        raise TimeoutError("receiver did not answer the session handshake")
+
+    def send_chunks(self, chunks: PayloadSource, start: int = 0, end: Optional[int] = None):
+        """
+        Sends segments start..end-1 (the whole payload by default), then the
+        EOF marker at the end of that range. Sequence numbers stay absolute
+        byte offsets into the payload, so a range can be one stripe of a
+        striped transfer. A v2 sender opens its session first, unless it
+        already has one.
+        """
+        digest = self.start_transfer(chunks, start, end)
+        while self.base < self.end:
+            window_end = self.fill_window()
+            now = time.time()
+            if self.fire_timers(now):
+                if self.timeouts >= self.max_timeouts:
+                    break
+                continue
+            self.socket.settimeout(self.next_wakeup(now, window_end))
+            try:
+                ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
+            except socket.timeout:
+                # expired timers (or paced sends) are handled at the top of
+                # the loop, and their sends may again wait for buffer room
+                self.socket.settimeout(self.rtt.rto)
+                continue
+            self.handle_acks(ack_pkt)
+
+        self.timers.clear()
+        self.finish(self.end_bytes, digest.result() if digest is not None else b"")
+        duration = time.time() - self.start_time
+        return self.total_bytes, duration, self.metrics
+
+    def start_transfer(self, chunks: PayloadSource, start: int = 0,
+                       end: Optional[int] = None) -> Optional[RangeDigest]:
+        """
+        Sets up the sender for segments start..end-1 and returns the digest
+        being computed for the EOF marker (None for the legacy wire).
+        """
+        if self.version >= 2:
+            session = self.wire if self.wire is not LEGACY else self.connect(chunks.mss)
+            if session.mss != chunks.mss:
+                if start or end is not None:
+                    raise ValueError(f"receiver only takes {session.mss}-byte segments")
+                chunks = chunks.resized(session.mss)
+        self.chunks = chunks
+        mss = self.mss = chunks.mss
+        self.scoreboard = SackScoreboard(mss)
+        self.batch.reserve(header_size(self.version) + mss)
+        self.end = len(chunks) if end is None else end
+        self.end_bytes = min(self.end * mss, chunks.total_bytes)
+        self.start_bytes = start * mss
+        self.base = self.next_seq = self.outstanding.base = start
+        self.start_time = time.time()
+        # the receiver checks a v2 transfer against this instead of the file
+        return chunks.digest(self.start_bytes, self.end_bytes) if self.version >= 2 else None
+
+    def fill_window(self) -> int:
+        """Sends what the window (and the pacer) allows and returns the window's end."""
+        window_end = min(self.base + self.cc.window(), self.end)
+        limit = window_end
+        if self.pacer is not None and self.next_seq < limit:
+            cc = self.cc
+            rate = cc.pacing_rate(self)
+            if rate is None:
+                self.pacer.set_rate(cc.cwnd, self.rtt.srtt, cc.cwnd < cc.ssthresh)
+            else:
+                self.pacer.set_packet_rate(rate)
+            limit = self.next_seq + self.pacer.allowance(limit - self.next_seq)
+            self.pacer.consume(limit - self.next_seq)
+        self.outstanding.ensure(limit)
+        sacked = self.scoreboard.sacked
+        mss = self.mss
+        while self.next_seq < limit:
+            if sacked and self.next_seq in sacked:
+                # after go_back_n(): the receiver already holds this one
+                self.next_seq += 1
+                continue
+            self._send(self.next_seq)
+            self.total_bytes = max(self.total_bytes, min((self.next_seq + 1) * mss, self.end_bytes) - self.start_bytes)
+            self.next_seq += 1
+        self.batch.flush()
+        return window_end
+
+    def fire_timers(self, now: float) -> bool:
+        """
+        Handles the retransmission timers that ran out by `now` and returns
+        whether any did. Once the oldest segment has timed out max_timeouts
+        times in a row nothing is resent, and the caller gives up.
+        """
+        scoreboard = self.scoreboard
+        expired = [idx for idx in self.timers.expired(now) if not scoreboard.is_sacked(idx)]
+        if not expired:
+            return False
+        # The oldest outstanding segment timing out is the RTO event (back
+        # off, let the strategy react, give up eventually). Timers of later
+        # segments fire microseconds apart, so they are only resent.
+        rto_fired = self.base in expired
+        if not rto_fired:
+            # The base is still outstanding (its own timer is armed), so a
+            # later segment is most likely already held behind that hole at
+            # the receiver. Only resend what SACK reports missing; the rest
+            # waits for the base's RTO.
+            deadline = now + self.rtt.rto
+            missing = []
+            for idx in expired:
+                if scoreboard.active and idx < scoreboard.high_sacked:
+                    missing.append(idx)
+                else:
+                    self.timers.arm(idx, deadline)
+            if not missing:
+                return False
+            expired = missing
+        if rto_fired:
+            self.timeouts += 1
+            # debugging
+            # print(f"[TIMEOUT] base={self.base} expired={len(expired)} cwnd={self.cc.cwnd} timeouts={self.timeouts}")
+            if self.timeouts >= self.max_timeouts:
+                return True
+        self.handle_timeout(expired, rto_fired)
+        return True
+
+    def next_wakeup(self, now: float, window_end: int) -> float:
+        """Seconds until the next retransmission timer or paced send is due."""
+        deadline = self.timers.next_deadline()
+        wait = deadline - now if deadline is not None else self.rtt.rto
+        if self.pacer is not None and self.next_seq < window_end:
+            # wake up in time to send the next paced packet
+            pace = self.pacer.wait_time()
+            if pace > 0:
+                wait = min(wait, pace)
+        return wait
+
+    def handle_acks(self, ack_pkt: bytes) -> None:
+        """
+        Handles `ack_pkt` and every ACK already queued behind it before the
+        window is refilled, so a burst of ACKs becomes one window fill (and
+        one sendmmsg).
+        """
+        self.timeouts = 0
+        self.handle_ack(ack_pkt)
+        timeout = self.socket.gettimeout()
+        self.socket.settimeout(0)
+        while self.base < self.end:
+            try:
+                ack_pkt = self.socket.recv(PACKET_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            self.handle_ack(ack_pkt)
+        if timeout:
+            # Blocking again before the window is refilled, so a full send
+            # buffer is waited out instead of failing with EAGAIN. The
+            # asyncio sender's socket stays non-blocking.
+            self.socket.settimeout(self.rtt.rto)
+        self.cc.on_ack_burst(self)
+
+    def handle_ack(self, ack_pkt: bytes) -> None:
+        ack = self.wire.parse_ack(ack_pkt)
+        if ack is None:
+            # another session's packet
+            return
+        ack_id, _, blocks = ack
+        self.scoreboard.update(ack_id, blocks)
+        ack_idx = self.ack_index(ack_id)
+
+        if ack_idx > self.base:
+            now = time.time()
+            outstanding = self.outstanding
+            send_times = outstanding.send_times
+            retransmitted = outstanding.retransmitted
+            mask = outstanding.mask
+            # Karn: an ACK covering a resent segment may be for either copy,
+            # and after a hole is filled it also covers segments that arrived
+            # long ago, so it is not timed at all.
+            ambiguous = False
+            sent = 0.0
+            for idx in range(self.base, ack_idx):
+                # release the slot as the cumulative ACK passes it
+                slot = idx & mask
+                if retransmitted[slot]:
+                    ambiguous = True
+                    retransmitted[slot] = 0
+                if send_times[slot]:
+                    sent = send_times[slot]
+                send_times[slot] = 0.0
+            # One delay sample per ACK, timed from the newest segment it
+            # covers: segments held behind a hole would otherwise each add
+            # up to a full RTO to the metrics.
+            self.rtt_sampled = False
+            if sent:
+                self.last_delay = now - sent
+                self.metrics.add_delay(self.last_delay)
+                if not ambiguous:
+                    self.rtt.sample(self.last_delay)
+                    self.rtt_sampled = True
+            self.rtt.reset_backoff()
+            self.timers.cancel_range(self.base, ack_idx)
+            newly_acked = ack_idx - self.base
+            self.base = outstanding.base = ack_idx
+            if self.next_seq < self.base:
+                self.next_seq = self.base
+            self.last_ack = ack_id
+            self.dupacks = 0
+            # debugging
+            # print(f"[NEW ACK] base={self.base} cwnd={self.cc.cwnd}")
+            self.cc.on_ack(self, newly_acked)
+        elif ack_id == self.last_ack:
+            self.dupacks += 1
+            self.cc.on_dupack(self, self.dupacks)
+        else:
+            self.last_ack = ack_id
+            self.dupacks = 0
+
+    def handle_timeout(self, expired: List[int], rto_fired: bool = True) -> None:
+        if rto_fired:
+            self.dupacks = 0
+            self.rtt.back_off()
+            self.cc.on_timeout(self, expired)
+        # Only the segments whose own timer fired are resent, no more than
+        # the (just reduced) window allows; the rest wait another RTO.
+        budget = self.cc.window()
+        deadline = time.time() + self.rtt.rto
+        for idx in expired:
+            if idx >= self.next_seq:
+                continue
+            if budget > 0:
+                self._send(idx)
+                budget -= 1
+            else:
+                self.timers.arm(idx, deadline)
+        self.batch.flush()
+
+    def finish(self, eof_seq: int, digest: bytes = b"") -> None:
+        """
+        Sends the EOF marker (with the payload digest, over v2) until it is
+        ACKed, then answers the receiver's FIN with FIN/ACK so it can exit
+        without waiting out its idle timeouts.
+        """
+        eof_acked = False
+        retries = 0
+        eof = self.wire.eof(eof_seq, digest)
+        self.socket.settimeout(self.rtt.rto)
+        self.batch.send(eof)
+        self.batch.flush()
+        while True:
+            try:
+                ack_pkt, _ = self.socket.recvfrom(PACKET_SIZE)
+            except socket.timeout:
+                retries += 1
+                if eof_acked or retries > self.max_timeouts:
+                    return
+                self.batch.send(eof)
+                self.batch.flush()
+                continue
+            ack = self.wire.parse_ack(ack_pkt)
+            if ack is None:
+                continue
+            ack_id, flags, _ = ack
+            if flags & FIN:
+                self.socket.sendto(self.wire.fin_ack(ack_id), self.addr)
+                return
+            if ack_id >= eof_seq:
+                eof_acked = True
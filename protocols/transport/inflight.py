@@ -0,0 +1,59 @@
+"""
+Bounded per-segment state for the segments in flight.
+
+WindowSender needs two facts per unacknowledged segment: when it was last
+sent (for delay samples and RTT), and whether it was ever retransmitted
+(Karn's rule). InFlight stores them in a power-of-two ring indexed by
+`segment & mask`, as an array('d') of timestamps and a bytearray of flags.
+A slot is cleared as soon as the cumulative ACK passes it. Memory therefore
+follows the largest window the transfer reached, not the file size. The
+ring doubles when a window outgrows it.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+INITIAL_CAPACITY = 256
+
+
+class InFlight:
+    __slots__ = ("base", "capacity", "mask", "send_times", "retransmitted")
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.base = 0
+        self.capacity = size
+        self.mask = size - 1
+        self.send_times = array("d", bytes(8 * size))
+        self.retransmitted = bytearray(size)
+
+    def ensure(self, end: int) -> None:
+        """Makes room for segments base..end-1, growing the ring if needed."""
+        if end - self.base <= self.capacity:
+            return
+        size = self.capacity
+        while size < end - self.base:
+            size <<= 1
+        send_times = array("d", bytes(8 * size))
+        retransmitted = bytearray(size)
+        old_mask, mask = self.mask, size - 1
+        for idx in range(self.base, self.base + self.capacity):
+            send_times[idx & mask] = self.send_times[idx & old_mask]
+            retransmitted[idx & mask] = self.retransmitted[idx & old_mask]
+        self.capacity = size
+        self.mask = mask
+        self.send_times = send_times
+        self.retransmitted = retransmitted
+
+    def on_send(self, idx: int, now: float) -> bool:
+        """Records a (re)transmission; returns True if the segment was sent before."""
+        slot = idx & self.mask
+        resent = self.send_times[slot] != 0.0
+        if resent:
+            # Karn: an ACK for this segment can no longer be timed
+            self.retransmitted[slot] = 1
+        self.send_times[slot] = now
+        return resent
@@ -0,0 +1,216 @@
+"""
+Streaming transfer metrics.
+
+calculate_metrics() used to need every delay sample of the transfer in a
+list, and then built a second list of differences to get the jitter.
+TransferMetrics folds each sample in as it arrives and keeps only:
+
+- Welford running mean/variance of the delay and of the jitter (the
+  absolute difference between consecutive delays, as before);
+- a LogHistogram sketch of each for p50/p95/p99.
+
+The summary reports the mean, the percentiles and the standard deviation of
+each.
+
+Memory is constant in the length of the transfer. Sketches and stats from
+separate runs or flows can be merged. add_delays() takes a whole batch at
+once and uses NumPy when it is installed (it is not inside the container),
+which is handy for post-processing recorded traces.
+
+The score formula and the final CSV line are unchanged, and the CSV line is
+still printed last.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Anything at or below this is counted as zero: log() is undefined there,
+# and sub-nanosecond delays are measurement noise.
+MIN_VALUE = 1e-9
+
+
+class StreamStats:
+    """Welford running count/mean/variance/min/max."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge_moments(self, count: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        """Folds in the moments of another batch (Chan et al.)."""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    def merge(self, other: StreamStats) -> None:
+        self.merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class LogHistogram:
+    """
+    Quantile sketch with log-spaced buckets: a value x lands in bucket
+    ceil(log(x) / log(gamma)), where gamma = (1 + a) / (1 - a). Every
+    quantile it returns is within relative error `a` of the true value.
+    The bucket count grows with log(max/min), not with the number of
+    samples. Two sketches with the same accuracy merge by adding counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        if x <= MIN_VALUE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def add_counts(self, keys, counts, zeros: int) -> None:
+        buckets = self.buckets
+        for key, n in zip(keys, counts):
+            buckets[key] = buckets.get(key, 0) + n
+        self.zero_count += zeros
+        self.count += zeros + sum(counts)
+
+    def merge(self, other: LogHistogram) -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.add_counts(other.buckets.keys(), list(other.buckets.values()), other.zero_count)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class TransferMetrics:
+    """Per-transfer delay and jitter statistics, updated one sample at a time."""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.delay = StreamStats()
+        self.jitter = StreamStats()
+        self.delay_sketch = LogHistogram(relative_accuracy)
+        self.jitter_sketch = LogHistogram(relative_accuracy)
+        self.last_delay: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self.delay.count
+
+    def add_delay(self, delay: float) -> None:
+        self.delay.add(delay)
+        self.delay_sketch.add(delay)
+        if self.last_delay is not None:
+            jitter = abs(delay - self.last_delay)
+            self.jitter.add(jitter)
+            self.jitter_sketch.add(jitter)
+        self.last_delay = delay
+
+    def add_delays(self, delays: Iterable[float]) -> None:
+        """Adds a batch of consecutive samples (vectorized when NumPy is available)."""
+        if np is None:
+            for delay in delays:
+                self.add_delay(delay)
+            return
+        values = np.asarray(delays, dtype=np.float64)
+        if values.size == 0:
+            return
+        if self.last_delay is None:
+            jitters = np.abs(np.diff(values))
+        else:
+            jitters = np.abs(np.diff(values, prepend=self.last_delay))
+        self._add_batch(self.delay, self.delay_sketch, values)
+        self._add_batch(self.jitter, self.jitter_sketch, jitters)
+        self.last_delay = float(values[-1])
+
+    @staticmethod
+    def _add_batch(stats: StreamStats, sketch: LogHistogram, values) -> None:
+        if values.size == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        stats.merge_moments(int(values.size), mean, m2, float(values.min()), float(values.max()))
+        positive = values[values > MIN_VALUE]
+        keys, counts = np.unique(np.ceil(np.log(positive) / sketch.log_gamma).astype(np.int64), return_counts=True)
+        sketch.add_counts(keys.tolist(), counts.tolist(), int(values.size - positive.size))
+
+    def merge(self, other: TransferMetrics) -> None:
+        """Combines the statistics of another flow; jitter across the two streams is not counted."""
+        self.delay.merge(other.delay)
+        self.jitter.merge(other.jitter)
+        self.delay_sketch.merge(other.delay_sketch)
+        self.jitter_sketch.merge(other.jitter_sketch)
+
+
+def calculate_metrics(total_bytes: int, duration: float,
+                      samples: Union[TransferMetrics, Iterable[float]]) -> None:
+    if isinstance(samples, TransferMetrics):
+        metrics = samples
+    else:
+        metrics = TransferMetrics()
+        metrics.add_delays(samples)
+
+    throughput = total_bytes / duration if duration > 0 else 0.0
+    avg_delay = metrics.delay.mean
+    avg_jitter = metrics.jitter.mean
+    safe_t = throughput if throughput > 0 else 1e-9
+    safe_d = avg_delay if avg_delay > 0 else 1e-9
+    safe_j = avg_jitter if avg_jitter > 0 else 1e-9
+    metric = (2000 / safe_t) + (15 / safe_j) + (35 / safe_d)
+
+    d, j = metrics.delay_sketch, metrics.jitter_sketch
+    print("\nTransfer complete!")
+    print(f"duration={duration:.3f}s throughput={throughput:.2f} bytes/sec")
+    print(f"avg_delay={avg_delay:.6f}s avg_jitter={avg_jitter:.6f}s")
+    print(f"delay p50={d.quantile(0.5):.6f}s p95={d.quantile(0.95):.6f}s p99={d.quantile(0.99):.6f}s "
+          f"stdev={metrics.delay.stdev:.6f}s")
+    print(f"jitter p50={j.quantile(0.5):.6f}s p95={j.quantile(0.95):.6f}s p99={j.quantile(0.99):.6f}s "
+          f"stdev={metrics.jitter.stdev:.6f}s")
+    print(f"{throughput:.7f},{avg_delay:.7f},{avg_jitter:.7f},{metric:.7f}")
@@ -0,0 +1,64 @@
+"""
+Per-interval ACK statistics for controllers that decide once per monitor
+interval (one SRTT, or N ACKs) rather than on every ACK.
+
+A MonitorInterval is restarted with begin() at the start of each interval
+and fed every ACK. At the end of the interval it gives the loss rate (the
+share of segments sent during the interval that were retransmissions), the
+min/avg RTT and the delivery rate.
+"""
+
+from __future__ import annotations
+
+import math
+
+
+class MonitorInterval:
+    __slots__ = ("start", "acks", "delivered", "rtt_min", "rtt_sum", "rtt_samples",
+                 "sent_at_start", "resent_at_start")
+
+    def __init__(self):
+        self.start = 0.0
+        self.acks = 0
+        self.delivered = 0
+        self.rtt_min = math.inf
+        self.rtt_sum = 0.0
+        self.rtt_samples = 0
+        self.sent_at_start = 0
+        self.resent_at_start = 0
+
+    def begin(self, sender, now: float) -> None:
+        self.start = now
+        self.acks = 0
+        self.delivered = 0
+        self.rtt_min = math.inf
+        self.rtt_sum = 0.0
+        self.rtt_samples = 0
+        self.sent_at_start = sender.segments_sent
+        self.resent_at_start = sender.segments_resent
+
+    def on_ack(self, newly_acked: int, rtt: float) -> None:
+        self.acks += 1
+        self.delivered += newly_acked
+        if rtt > 0:
+            self.rtt_samples += 1
+            self.rtt_sum += rtt
+            if rtt < self.rtt_min:
+                self.rtt_min = rtt
+
+    def on_dupack(self) -> None:
+        self.acks += 1
+
+    def loss(self, sender) -> float:
+        sent = sender.segments_sent - self.sent_at_start
+        resent = sender.segments_resent - self.resent_at_start
+        return resent / sent if sent else 0.0
+
+    @property
+    def avg_rtt(self) -> float:
+        return self.rtt_sum / self.rtt_samples if self.rtt_samples else 0.0
+
+    def delivery_rate(self, now: float, mss: int) -> float:
+        """Bytes per second acknowledged during the interval."""
+        elapsed = now - self.start
+        return self.delivered * mss / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,74 @@
+"""
+Send pacing for the window-based senders.
+
+Without pacing, the window fill sends every packet the window allows back to
+back. With the 20k-50k packet netem queues in training_profile.sh, those
+bursts sit in the bottleneck queue and show up as delay and jitter. A Pacer
+is a token bucket refilled at
+
+    rate = gain * cwnd / SRTT   (packets per second)
+
+so a window is spread over roughly one round trip. As in Linux, the gain is
+2.0 in slow start so the window can still double each RTT, and 1.2
+afterwards. Until the first RTT sample the sender is not paced.
+
+Pacing is off by default; set SENDER_PACING=1 to enable it.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Optional
+
+PACING = os.environ.get("SENDER_PACING", "0") == "1"
+SLOW_START_GAIN = float(os.environ.get("SENDER_PACING_SS_GAIN", "2.0"))
+CONGESTION_AVOIDANCE_GAIN = float(os.environ.get("SENDER_PACING_CA_GAIN", "1.2"))
+MIN_BURST = int(os.environ.get("SENDER_PACING_BURST", "2"))
+
+# recvfrom() timeouts are rounded up to whole milliseconds by poll(), so the
+# bucket must hold at least that much traffic or the rate is capped at one
+# burst per millisecond.
+WAKEUP_GRANULARITY = 0.002
+
+
+class Pacer:
+    def __init__(self, min_burst: int = MIN_BURST):
+        self.min_burst = min_burst
+        self.rate = 0.0
+        self.burst = float(min_burst)
+        self.tokens = float(min_burst)
+        self.last = time.monotonic()
+
+    def set_rate(self, cwnd: float, srtt: Optional[float], slow_start: bool) -> None:
+        if not srtt:
+            self.rate = 0.0
+            return
+        gain = SLOW_START_GAIN if slow_start else CONGESTION_AVOIDANCE_GAIN
+        self.set_packet_rate(gain * cwnd / srtt)
+
+    def set_packet_rate(self, rate: float) -> None:
+        """Paces at `rate` packets per second (0 disables pacing)."""
+        self.rate = rate
+        self.burst = max(self.min_burst, rate * WAKEUP_GRANULARITY)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def allowance(self, wanted: int) -> int:
+        """How many of `wanted` packets may go out now."""
+        if self.rate <= 0:
+            return wanted
+        self._refill(time.monotonic())
+        return min(wanted, int(self.tokens))
+
+    def consume(self, packets: int) -> None:
+        if self.rate > 0:
+            self.tokens -= packets
+
+    def wait_time(self) -> float:
+        """Seconds until the next packet may be sent."""
+        if self.rate <= 0 or self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
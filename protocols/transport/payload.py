@@ -0,0 +1,120 @@
+"""
+Zero-copy access to the payload file.
+
+load_payload_chunks() used to read the whole file and then slice it into a
+list of MSS-sized bytes objects, holding the file in memory twice. A
+PayloadSource memory-maps the file instead and hands out memoryview
+segments on demand, so startup cost and RSS no longer grow with file size.
+It supports len(), indexing and iteration like the old list of chunks.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import sys
+import threading
+from typing import List, Optional
+
+DEFAULT_PAYLOAD = b"DemoPayloadForECS152A" * 100
+
+
+def find_payload_file() -> str:
+    """
+    Returns the first existing file among TEST_FILE, PAYLOAD_FILE,
+    /hdd/file.zip and file.zip, exiting like the senders always have if none
+    is found.
+    """
+    candidates = [
+        os.environ.get("TEST_FILE"),
+        os.environ.get("PAYLOAD_FILE"),
+        "/hdd/file.zip",
+        "file.zip",
+    ]
+    for path in candidates:
+        if not path:
+            continue
+        expanded = os.path.expanduser(path)
+        if os.path.exists(expanded):
+            return expanded
+    print(
+        "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
+        file=sys.stderr,
+    )
+    sys.exit(1)
+
+
+class RangeDigest:
+    """
+    SHA-256 of a slice of the payload, computed on a background thread while
+    the transfer runs (hashlib releases the GIL), so the sender has the digest
+    for its EOF without an extra pass over the file at the end.
+    """
+
+    def __init__(self, data: memoryview):
+        self._digest = b""
+        self._thread = threading.Thread(target=self._run, args=(data,), daemon=True)
+        self._thread.start()
+
+    def _run(self, data: memoryview) -> None:
+        self._digest = hashlib.sha256(data).digest()
+
+    def result(self) -> bytes:
+        self._thread.join()
+        return self._digest
+
+
+class PayloadSource:
+    def __init__(self, path: Optional[str], mss: int):
+        self.path = path
+        self.mss = mss
+        self._file = None
+        self._map = None
+        self._resized: List[PayloadSource] = []
+        if path is not None and os.path.getsize(path) > 0:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            # Empty (or missing) payloads fall back to the demo string
+            self._view = memoryview(DEFAULT_PAYLOAD)
+        self.total_bytes = len(self._view)
+        self._count = -(-self.total_bytes // mss)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: int) -> memoryview:
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("segment index out of range")
+        start = idx * self.mss
+        return self._view[start:start + self.mss]
+
+    def digest(self, start: int, end: int) -> RangeDigest:
+        """Starts hashing bytes start..end-1."""
+        return RangeDigest(self._view[start:end])
+
+    def resized(self, mss: int) -> PayloadSource:
+        """The same payload cut into `mss`-byte segments."""
+        if mss == self.mss:
+            return self
+        source = PayloadSource(self.path, mss)
+        self._resized.append(source)
+        return source
+
+    def close(self) -> None:
+        """Unmaps the payload, along with every copy resized() made of it."""
+        for source in self._resized:
+            source.close()
+        self._resized.clear()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+
+
+def load_payload(mss: int) -> PayloadSource:
+    return PayloadSource(find_payload_file(), mss)
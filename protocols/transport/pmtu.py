@@ -0,0 +1,74 @@
+"""
+Path MTU probing, for SENDER_MSS=auto.
+
+Segments are sized to fit a 1024-byte datagram. On the simulator's loopback
+path (MTU 65536) this means the per-packet Python overhead, not the bytes,
+caps throughput. Larger segments only help if the path and the receiver's
+buffer carry them whole. As in packetization-layer PMTU discovery
+(RFC 8899), the sender finds out by probing instead of trusting ICMP. It
+sends one PROBE datagram, padded to the size being tried, for each
+candidate size, with fragmentation turned off where the OS allows it. The
+receiver echoes how many bytes arrived and keeps no state, so a probe
+truncated by its receive buffer does not count. The largest size echoed in
+full wins. The whole ladder goes out at once, twice in case of loss, so
+probing costs about one round trip.
+"""
+
+from __future__ import annotations
+
+import socket
+import time
+from typing import Sequence, Tuple
+
+from transport.wire import make_probe, new_session_id, parse_probe_ack
+
+# Datagram sizes to try: the largest IPv4 UDP payload, common jumbo and
+# Ethernet sizes, and the 1024 bytes every receiver takes
+PROBE_SIZES = (65507, 32768, 16384, 9000, 8192, 4096, 1472, 1024)
+PROBE_ROUNDS = 2
+# After the first answer, wait this many times its round trip (at least
+# PROBE_MIN_WAIT seconds) for the answers to larger probes
+PROBE_WAIT_RTTS = 2
+PROBE_MIN_WAIT = 0.01
+
+
+def probe_datagram_size(addr: Tuple[str, int], timeout: float,
+                        sizes: Sequence[int] = PROBE_SIZES) -> int:
+    """
+    Returns the largest of `sizes` that reached the receiver whole, or 0 if
+    no probe was answered within `timeout` (e.g. a receiver without v2).
+    """
+    probe_id = new_session_id()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        if hasattr(socket, "IP_MTU_DISCOVER"):
+            # don't fragment: a probe too big for the path must fail
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MTU_DISCOVER,
+                            getattr(socket, "IP_PMTUDISC_PROBE", 3))
+        sent = set()
+        start = time.time()
+        for _ in range(PROBE_ROUNDS):
+            for size in sizes:
+                try:
+                    sock.sendto(make_probe(probe_id, size), addr)
+                except OSError:
+                    # EMSGSIZE: more than the local interface takes
+                    continue
+                sent.add(size)
+        best = 0
+        deadline = start + timeout
+        while sent and best < max(sent):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                size = parse_probe_ack(sock.recv(2048), probe_id)
+            except socket.timeout:
+                break
+            if size not in sent:
+                continue
+            if not best:
+                now = time.time()
+                deadline = min(deadline, now + max(PROBE_WAIT_RTTS * (now - start), PROBE_MIN_WAIT))
+            best = max(best, size)
+        return best
@@ -0,0 +1,62 @@
+"""
+Precompiled linear cwnd policy for the ML sender.
+
+custom_protocol/model.py trains a multinomial logistic regression on
+StandardScaler-scaled Pantheon features: loss as a fraction, delay in ms,
+throughput in Mbit/s. model.py's export_policy() writes the scaler and
+coefficients to a small JSON file, because sklearn is not available inside
+the container.
+
+LinearPolicy loads that file once. It folds the caller's unit conversion
+and the scaler into a single weight matrix:
+
+    score = W (units * x - mean) / scale + b = W' x + b'
+
+so each decision is one small matrix-vector product on raw sender
+measurements, followed by an argmax. The argmax of the logistic scores is
+also the argmax of the class probabilities, so softmax is skipped.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Optional, Sequence
+
+
+class LinearPolicy:
+    __slots__ = ("classes", "weights", "bias")
+
+    def __init__(self, classes: Sequence[str], coef: Sequence[Sequence[float]],
+                 intercept: Sequence[float], mean: Sequence[float], scale: Sequence[float],
+                 input_units: Optional[Sequence[float]] = None):
+        n_features = len(mean)
+        units = list(input_units) if input_units is not None else [1.0] * n_features
+        if not (len(scale) == len(units) == n_features) or any(len(row) != n_features for row in coef):
+            raise ValueError("policy coefficients do not match the number of features")
+        self.classes = list(classes)
+        self.weights = tuple(
+            tuple(w * u / s for w, u, s in zip(row, units, scale)) for row in coef
+        )
+        self.bias = tuple(
+            b - sum(w * m / s for w, m, s in zip(row, mean, scale))
+            for row, b in zip(coef, intercept)
+        )
+
+    @classmethod
+    def from_file(cls, path: str, input_units: Optional[Sequence[float]] = None) -> LinearPolicy:
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["classes"], spec["coef"], spec["intercept"],
+                   spec["scaler_mean"], spec["scaler_scale"], input_units)
+
+    def decide(self, features: Sequence[float]) -> int:
+        """Returns the index (into self.classes) of the highest-scoring action."""
+        best_idx = 0
+        best = None
+        for idx, (row, b) in enumerate(zip(self.weights, self.bias)):
+            score = b
+            for w, x in zip(row, features):
+                score += w * x
+            if best is None or score > best:
+                best, best_idx = score, idx
+        return best_idx
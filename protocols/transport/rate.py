@@ -0,0 +1,178 @@
+"""
+Per-ACK delivery-rate sampling, for model-based congestion control.
+
+The senders only ever measured throughput as bytes acknowledged so far divided
+by the time since the transfer started. That is an average over the whole
+transfer and does not reveal the bottleneck bandwidth. DeliveryRateSampler
+follows the delivery-rate estimation draft (draft-cheng-iccrg-delivery-rate-
+estimation). When a segment is sent, it records how many segments had been
+delivered so far and when. When the cumulative ACK passes that segment, the
+sample is
+
+    rate = (delivered now - delivered at send) / max(send interval, ACK interval)
+
+in segments per second, together with an RTT sample for the same segment.
+Samples that cover a retransmitted segment are dropped, as in Karn's rule:
+after a hole is filled, the ACK also covers data that arrived long before.
+
+The per-segment state lives in a power-of-two ring indexed by
+`segment & mask`, like InFlight. WindowedMax and WindowedMin keep the running
+max bandwidth over the last N rounds and the min RTT over the last N seconds.
+"""
+
+from __future__ import annotations
+
+import math
+from array import array
+from collections import deque
+from typing import Optional
+
+INITIAL_CAPACITY = 256
+
+
+class RateSample:
+    __slots__ = ("rate", "rtt", "delivered", "prior_delivered", "interval")
+
+    def __init__(self, rate: float, rtt: float, delivered: int, prior_delivered: int,
+                 interval: float):
+        self.rate = rate
+        self.rtt = rtt
+        self.delivered = delivered
+        self.prior_delivered = prior_delivered
+        self.interval = interval
+
+
+class DeliveryRateSampler:
+    __slots__ = ("delivered", "delivered_time", "first_sent_time", "capacity", "mask",
+                 "sent_time", "sent_delivered", "sent_delivered_time", "sent_first_sent_time",
+                 "resent")
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.delivered = 0
+        self.delivered_time = 0.0
+        self.first_sent_time = 0.0
+        self._allocate(size)
+
+    def _allocate(self, size: int) -> None:
+        self.capacity = size
+        self.mask = size - 1
+        self.sent_time = array("d", bytes(8 * size))
+        self.sent_delivered = array("q", bytes(8 * size))
+        self.sent_delivered_time = array("d", bytes(8 * size))
+        self.sent_first_sent_time = array("d", bytes(8 * size))
+        self.resent = bytearray(size)
+
+    def _grow(self, base: int, end: int) -> None:
+        size = self.capacity
+        while size < end - base:
+            size <<= 1
+        old = (self.mask, self.sent_time, self.sent_delivered, self.sent_delivered_time,
+               self.sent_first_sent_time, self.resent)
+        old_mask = old[0]
+        self._allocate(size)
+        for idx in range(base, base + len(old[5])):
+            src, dst = idx & old_mask, idx & self.mask
+            self.sent_time[dst] = old[1][src]
+            self.sent_delivered[dst] = old[2][src]
+            self.sent_delivered_time[dst] = old[3][src]
+            self.sent_first_sent_time[dst] = old[4][src]
+            self.resent[dst] = old[5][src]
+
+    def on_send(self, idx: int, base: int, in_flight: int, now: float) -> None:
+        if idx - base >= self.capacity:
+            self._grow(base, idx + 1)
+        if in_flight == 0:
+            # nothing outstanding: the send and ACK intervals start afresh
+            self.first_sent_time = now
+            self.delivered_time = now
+        slot = idx & self.mask
+        if self.sent_time[slot] != 0.0:
+            self.resent[slot] = 1
+        self.sent_time[slot] = now
+        self.sent_delivered[slot] = self.delivered
+        self.sent_delivered_time[slot] = self.delivered_time
+        self.sent_first_sent_time[slot] = self.first_sent_time
+
+    def on_ack(self, first: int, end: int, now: float) -> Optional[RateSample]:
+        """
+        The cumulative ACK passed segments first..end-1. Returns the sample
+        for the most recently sent of them, or None if it cannot be used.
+        """
+        mask = self.mask
+        sent_time = self.sent_time
+        resent = self.resent
+        ambiguous = False
+        last_slot = -1
+        last_sent = 0.0
+        for idx in range(first, end):
+            slot = idx & mask
+            if resent[slot]:
+                ambiguous = True
+                resent[slot] = 0
+            if sent_time[slot] >= last_sent:
+                last_sent = sent_time[slot]
+                last_slot = slot
+        prior_delivered = self.sent_delivered[last_slot] if last_slot >= 0 else self.delivered
+        self.delivered += end - first
+        self.delivered_time = now
+        for idx in range(first, end):
+            sent_time[idx & mask] = 0.0
+        if ambiguous or last_sent == 0.0:
+            return None
+        # the segment sent last was sent after the others, so its send
+        # interval is the most recent
+        self.first_sent_time = last_sent
+        send_elapsed = last_sent - self.sent_first_sent_time[last_slot]
+        ack_elapsed = now - self.sent_delivered_time[last_slot]
+        interval = max(send_elapsed, ack_elapsed)
+        if interval <= 0:
+            return None
+        delivered = self.delivered - prior_delivered
+        return RateSample(delivered / interval, now - last_sent, delivered, prior_delivered, interval)
+
+
+class WindowedMax:
+    """Running max of the values seen in the last `window` rounds (monotonic deque)."""
+
+    __slots__ = ("window", "samples")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.samples = deque()
+
+    def update(self, value: float, round_count: int) -> None:
+        samples = self.samples
+        while samples and samples[-1][1] <= value:
+            samples.pop()
+        samples.append((round_count, value))
+        while samples[0][0] <= round_count - self.window:
+            samples.popleft()
+
+    @property
+    def best(self) -> float:
+        return self.samples[0][1] if self.samples else 0.0
+
+
+class WindowedMin:
+    """Min of the values seen in the last `window` seconds; also remembers when it was set."""
+
+    __slots__ = ("window", "value", "stamp")
+
+    def __init__(self, window: float):
+        self.window = window
+        self.value = math.inf
+        self.stamp = 0.0
+
+    def expired(self, now: float) -> bool:
+        return now - self.stamp > self.window
+
+    def update(self, value: float, now: float) -> bool:
+        """Returns True if `value` became the new minimum."""
+        if value <= self.value or self.expired(now):
+            self.value = value
+            self.stamp = now
+            return True
+        return False
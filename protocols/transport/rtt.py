@@ -0,0 +1,70 @@
+"""
+Retransmission timeout estimation (RFC 6298).
+
+The senders used a fixed ACK_TIMEOUT (1 s, or 3 s for Tahoe). On the
+30-140 ms paths of training_profile.sh, that left the pipe idle for 10-30
+RTTs after every loss. RttEstimator tracks SRTT and RTTVAR from the ACKed
+segments' send times:
+
+    RTO = SRTT + max(G, 4 * RTTVAR)
+
+It doubles the RTO on every timeout. Following Karn's rule, callers only
+feed it samples from segments that were never retransmitted. Strict Karn
+keeps the backed-off RTO until such a sample arrives, but while every
+window has a hole, every ACK that advances covers a resent segment and the
+RTO would double forever. So, as QUIC does (RFC 9002), the back-off is
+dropped as soon as the cumulative ACK advances again.
+"""
+
+from __future__ import annotations
+
+import os
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+CLOCK_GRANULARITY = 0.001
+
+# RFC 6298 recommends a 1 s floor; like most stacks we go lower (Linux uses
+# 200 ms) since the emulated paths never exceed a few hundred ms.
+MIN_RTO = float(os.environ.get("SENDER_MIN_RTO", "0.2"))
+MAX_RTO = float(os.environ.get("SENDER_MAX_RTO", "60.0"))
+
+
+class RttEstimator:
+    def __init__(self, initial_rto: float = 1.0, min_rto: float = MIN_RTO, max_rto: float = MAX_RTO):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = 0.0
+        self.rto = initial_rto
+        self.backoffs = 0
+
+    def sample(self, rtt: float) -> float:
+        """Feeds one RTT measurement (seconds) and returns the new RTO."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.backoffs = 0
+        return self._update_rto()
+
+    def _update_rto(self) -> float:
+        rto = self.srtt + max(CLOCK_GRANULARITY, K * self.rttvar)
+        self.rto = min(max(rto, self.min_rto), self.max_rto)
+        return self.rto
+
+    def reset_backoff(self) -> float:
+        """Drops the timeout back-off once new data is ACKed, without a sample."""
+        if self.backoffs and self.srtt is not None:
+            self.backoffs = 0
+            self._update_rto()
+        return self.rto
+
+    def back_off(self) -> float:
+        """Doubles the RTO after a retransmission timeout."""
+        self.backoffs += 1
+        self.rto = min(self.rto * 2, self.max_rto)
+        return self.rto
@@ -0,0 +1,80 @@
+"""
+Selective acknowledgement support.
+
+When the receiver runs with RECEIVER_SACK_BLOCKS=N, every ACK is
+`seq_id (4 bytes) + b"ack" + up to N (start, end) pairs`, where each pair is
+a big-endian signed 32-bit byte range received above the cumulative ACK.
+Plain ACKs simply carry no blocks, so everything here degrades to the old
+cumulative-only behaviour.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Iterator, List, Tuple
+
+SEQ_ID_SIZE = 4
+ACK_TAG = b"ack"
+SACK_BLOCK = struct.Struct(">ii")
+
+
+def parse_sack_blocks(packet: bytes) -> List[Tuple[int, int]]:
+    offset = SEQ_ID_SIZE + len(ACK_TAG)
+    if len(packet) < offset + SACK_BLOCK.size or packet[SEQ_ID_SIZE:offset] != ACK_TAG:
+        return []
+    usable = offset + (len(packet) - offset) // SACK_BLOCK.size * SACK_BLOCK.size
+    return [SACK_BLOCK.unpack_from(packet, i) for i in range(offset, usable, SACK_BLOCK.size)]
+
+
+class SackScoreboard:
+    """
+    Tracks which segments (by index, offset // mss) the receiver has reported
+    holding above the cumulative ACK, and which holes were already resent
+    during the current recovery episode.
+    """
+
+    def __init__(self, mss: int):
+        self.mss = mss
+        self.sacked: set[int] = set()
+        self.cumulative = 0
+        self.high_sacked = 0
+        self.retransmit_cursor = 0
+        self.active = False
+
+    def update(self, ack_id: int, blocks: List[Tuple[int, int]]) -> None:
+        cumulative = ack_id // self.mss
+        if cumulative > self.cumulative:
+            for idx in range(self.cumulative, min(cumulative, self.high_sacked)):
+                self.sacked.discard(idx)
+            self.cumulative = cumulative
+            self.retransmit_cursor = max(self.retransmit_cursor, cumulative)
+        self.high_sacked = max(self.high_sacked, cumulative)
+
+        for start, end in blocks:
+            self.active = True
+            first = max(-(-start // self.mss), cumulative)
+            last = -(-end // self.mss)
+            if last <= first:
+                continue
+            self.sacked.update(range(first, last))
+            if last > self.high_sacked:
+                self.high_sacked = last
+
+    def is_sacked(self, idx: int) -> bool:
+        return idx in self.sacked
+
+    def holes(self) -> Iterator[int]:
+        """
+        Yields segments below the highest SACKed one that the receiver is
+        still missing and that have not been resent in this recovery episode.
+        """
+        idx = max(self.retransmit_cursor, self.cumulative)
+        while idx < self.high_sacked:
+            if idx not in self.sacked:
+                self.retransmit_cursor = idx + 1
+                yield idx
+            idx += 1
+        self.retransmit_cursor = max(self.retransmit_cursor, idx)
+
+    def start_recovery(self) -> None:
+        self.retransmit_cursor = self.cumulative
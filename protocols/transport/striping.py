@@ -0,0 +1,187 @@
+"""
+Striped multi-flow transfers.
+
+A single flow can only carry cwnd packets per RTT. When that window cannot
+fill the path, SENDER_FLOWS=K splits the payload into K contiguous,
+MSS-aligned stripes and sends them in parallel. Each stripe runs on its own
+thread with its own WindowSender, which means its own socket, congestion
+controller, RTT estimate and timers.
+
+Before sending data, each flow registers its stripe with a control packet:
+
+    seq_id = -1 | b"STRIPE" | transfer id (u32) | index (u16) | count (u16) | start (i32) | end (i32)
+
+No data segment carries a negative offset, so the receiver cannot mistake
+it for data. The receiver answers with a cumulative ACK for `start`. After
+that, the flow's segments, ACKs, EOF and FIN exchange are exactly those of
+a single transfer, with absolute byte offsets. The receiver writes each
+stripe at its offset in one output file. A v2 flow (SENDER_WIRE=2) puts the
+same fields in its session's SYN instead. The per-flow throughputs and
+Jain's fairness index are printed before the usual metrics. With
+SENDER_ASYNC=1 the flows run as tasks on one asyncio loop (see aio.py)
+instead of on threads.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from transport.core import (
+    ACK_TIMEOUT, PACKET_SIZE, PROBE_MSS, V2_MSS, CongestionControl, WindowSender, header_size,
+    make_packet, parse_ack,
+)
+from transport.aio import ASYNC, AsyncWindowSender
+from transport.metrics import TransferMetrics
+from transport.payload import PayloadSource
+from transport.pmtu import probe_datagram_size
+from transport.wire import STRIPE_OPTION, WIRE
+
+FLOWS = int(os.environ.get("SENDER_FLOWS", "1"))
+
+CONTROL_SEQ = -1
+STRIPE_TAG = b"STRIPE"
+STRIPE_HEADER = struct.Struct(">IHHii")
+ACK_TAG = b"ack"
+
+
+def stripe_ranges(total_packets: int, count: int) -> List[Tuple[int, int]]:
+    """Splits segments 0..total_packets-1 into `count` contiguous ranges of near-equal size."""
+    count = max(min(count, total_packets), 1)
+    return [(total_packets * i // count, total_packets * (i + 1) // count) for i in range(count)]
+
+
+def make_stripe_packet(transfer_id: int, index: int, count: int, start: int, end: int) -> bytes:
+    return make_packet(CONTROL_SEQ, STRIPE_TAG + STRIPE_HEADER.pack(transfer_id, index, count, start, end))
+
+
+def open_stripe(sender: WindowSender, packet: bytes, start: int) -> None:
+    """
+    Sends the stripe registration until the receiver ACKs the stripe's
+    first byte. The round trip also seeds the flow's RTT estimate.
+    """
+    sender.socket.settimeout(sender.rtt.rto)
+    for _ in range(sender.max_timeouts):
+        sent_at = time.time()
+        sender.socket.sendto(packet, sender.addr)
+        try:
+            while True:
+                ack_id, tag = parse_ack(sender.socket.recv(PACKET_SIZE))
+                if ack_id == start and tag.startswith(ACK_TAG):
+                    sender.rtt.sample(time.time() - sent_at)
+                    return
+        except socket.timeout:
+            sender.rtt.back_off()
+            sender.socket.settimeout(sender.rtt.rto)
+    raise TimeoutError(f"receiver did not accept the stripe at offset {start}")
+
+
+def jain_fairness(rates: List[float]) -> float:
+    """(sum x)^2 / (n * sum x^2): 1.0 when every flow gets the same rate."""
+    squares = sum(r * r for r in rates)
+    return sum(rates) ** 2 / (len(rates) * squares) if squares else 1.0
+
+
+def send_payload(host: str, port: int, chunks: PayloadSource,
+                 make_cc: Callable[[], CongestionControl], flows: int = FLOWS,
+                 wire: int = WIRE, event_loop: bool = ASYNC,
+                 **sender_options) -> Tuple[int, float, TransferMetrics]:
+    """
+    Sends the payload with one WindowSender (flows=1) or as `flows` parallel
+    stripes. Returns (bytes sent, duration, metrics) like send_chunks(), with
+    the metrics of all flows merged. With `event_loop`, the flows are
+    AsyncWindowSenders on one asyncio loop. The payload is closed afterwards.
+    """
+    try:
+        return _send_payload(host, port, chunks, make_cc, flows, wire, event_loop, **sender_options)
+    finally:
+        # also unmaps the copies cut for a probed or granted segment size
+        chunks.close()
+
+
+def _send_payload(host: str, port: int, chunks: PayloadSource,
+                  make_cc: Callable[[], CongestionControl], flows: int, wire: int,
+                  event_loop: bool, **sender_options) -> Tuple[int, float, TransferMetrics]:
+    if PROBE_MSS:
+        # every flow uses the same segment size, so probe once up front
+        datagram = probe_datagram_size((host, port), sender_options.get("ack_timeout", ACK_TIMEOUT))
+        if datagram:
+            chunks = chunks.resized(datagram - header_size(wire))
+        # debugging
+        # print(f"[PMTU] datagram={datagram} mss={chunks.mss}")
+    elif wire >= 2:
+        # make room for the larger header
+        chunks = chunks.resized(min(chunks.mss, V2_MSS))
+    sender_options["wire"] = wire
+    sender_class = AsyncWindowSender if event_loop else WindowSender
+    if flows <= 1:
+        sender = sender_class(host, port, make_cc(), **sender_options)
+        if event_loop:
+            return asyncio.run(sender.send_chunks_async(chunks))
+        return sender.send_chunks(chunks)
+
+    transfer_id = random.getrandbits(32)
+    ranges = stripe_ranges(len(chunks), flows)
+    results: List[Optional[Tuple[int, float, TransferMetrics]]] = [None] * len(ranges)
+    errors: List[BaseException] = []
+
+    def open_flow(index: int, start: int, end: int) -> WindowSender:
+        sender = sender_class(host, port, make_cc(), **sender_options)
+        mss = chunks.mss
+        end_bytes = min(end * mss, chunks.total_bytes)
+        if wire >= 2:
+            sender.connect(mss, STRIPE_OPTION.pack(transfer_id, index, len(ranges), start * mss, end_bytes))
+        else:
+            open_stripe(sender, make_stripe_packet(transfer_id, index, len(ranges), start * mss, end_bytes),
+                        start * mss)
+        return sender
+
+    def run(index: int, start: int, end: int) -> None:
+        try:
+            results[index] = open_flow(index, start, end).send_chunks(chunks, start, end)
+        except BaseException as exc:
+            errors.append(exc)
+
+    async def run_async(index: int, start: int, end: int) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+            # the registration blocks, so it runs off the loop
+            sender = await loop.run_in_executor(None, open_flow, index, start, end)
+            results[index] = await sender.send_chunks_async(chunks, start, end)
+        except Exception as exc:
+            errors.append(exc)
+
+    async def run_all() -> None:
+        await asyncio.gather(*(run_async(i, start, end) for i, (start, end) in enumerate(ranges)))
+
+    start_time = time.time()
+    if event_loop:
+        asyncio.run(run_all())
+    else:
+        threads = [threading.Thread(target=run, args=(i, start, end), daemon=True)
+                   for i, (start, end) in enumerate(ranges)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    duration = time.time() - start_time
+    if errors:
+        raise errors[0]
+
+    metrics = TransferMetrics()
+    total_bytes = 0
+    rates = []
+    for index, (sent, flow_duration, flow_metrics) in enumerate(results):
+        total_bytes += sent
+        metrics.merge(flow_metrics)
+        rate = sent / flow_duration if flow_duration > 0 else 0.0
+        rates.append(rate)
+        print(f"flow {index}: {sent} bytes in {flow_duration:.3f}s ({rate:.2f} bytes/sec)")
+    print(f"{len(ranges)} flows, Jain's fairness index {jain_fairness(rates):.4f}")
+    return total_bytes, duration, metrics
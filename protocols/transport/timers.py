@@ -0,0 +1,68 @@
+"""
+Per-segment retransmission timers.
+
+A single socket timeout only fires once recvfrom() has been idle for a full
+RTO. The fixed-window sender then resent its whole window, and Reno and Tahoe
+missed losses for as long as unrelated ACKs kept arriving. RetransmitTimers
+gives every in-flight segment its own deadline, stored in a heap ordered by
+deadline. The send loop asks for the next deadline to size its recvfrom()
+wait, and resends only the segments whose own timer has expired.
+
+Entries are deleted lazily. Re-arming, cancelling or ACKing a segment only
+updates the `deadlines` dict, and outdated heap entries are discarded when
+they reach the top.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import List, Optional
+
+
+class RetransmitTimers:
+    def __init__(self):
+        self._heap = []
+        self.deadlines = {}
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def arm(self, idx: int, deadline: float) -> None:
+        """(Re)starts the timer for segment `idx`."""
+        self.deadlines[idx] = deadline
+        heapq.heappush(self._heap, (deadline, idx))
+
+    def cancel_range(self, start: int, end: int) -> None:
+        """Stops the timers of segments start..end-1 (cumulatively ACKed)."""
+        deadlines = self.deadlines
+        for idx in range(start, end):
+            deadlines.pop(idx, None)
+
+    def _discard_stale(self) -> None:
+        heap = self._heap
+        deadlines = self.deadlines
+        while heap:
+            deadline, idx = heap[0]
+            if deadlines.get(idx) == deadline:
+                return
+            heapq.heappop(heap)
+
+    def next_deadline(self) -> Optional[float]:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def expired(self, now: float) -> List[int]:
+        """Pops and returns, in deadline order, every segment whose timer has run out."""
+        heap = self._heap
+        deadlines = self.deadlines
+        fired = []
+        while heap and heap[0][0] <= now:
+            deadline, idx = heapq.heappop(heap)
+            if deadlines.get(idx) == deadline:
+                del deadlines[idx]
+                fired.append(idx)
+        return fired
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self.deadlines.clear()
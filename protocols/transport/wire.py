@@ -0,0 +1,153 @@
+"""
+Wire formats: the legacy 4-byte offset framing and the versioned v2 header.
+
+A legacy packet is a big-endian signed 32-bit byte offset and the payload.
+Nothing in it says which transfer it belongs to, so a late retransmission
+from the previous run on the same port is written into the next transfer.
+An empty payload marks EOF and the literal b"FIN/ACK" closes the transfer.
+Offsets also stop at 2 GB.
+
+SENDER_WIRE=2 switches a sender to the v2 header:
+
+    0x80 | version (u8) | flags (u8) | session id (u32) | offset (u64) | payload
+
+The high bit of the first byte is set, which no legacy offset has (-1, the
+stripe control packet, starts with 0xff, not 0x82). Flags are SYN, ACK, FIN
+and DATA. Before any data, the sender opens a session:
+
+    SYN      options: mss (u16) | SACK blocks wanted (u8) | delayed ACK every N (u8)
+             [| stripe: transfer id (u32) | index (u16) | count (u16) | start (u64) | end (u64)]
+    SYN|ACK  the options the receiver granted, each at most what was asked
+
+After that, DATA carries payload at `offset`, ACK carries the cumulative
+offset followed by (start, end) u64 SACK blocks, and FIN is the sender's
+EOF marker (carrying the SHA-256 of the bytes it sent) or the receiver's
+close. The sender answers the close with FIN|ACK. Both ends drop packets of
+any other session.
+
+PROBE is outside any session: the receiver answers a PROBE, padded to the
+datagram size being tried, with PROBE|ACK and the number of bytes that
+arrived in the offset field (see pmtu.py).
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import struct
+from typing import List, Optional, Tuple
+
+from transport.sack import parse_sack_blocks
+
+WIRE = int(os.environ.get("SENDER_WIRE", "1"))
+SACK_REQUEST = int(os.environ.get("SENDER_SACK_BLOCKS", "4"))
+DELAYED_ACK_REQUEST = int(os.environ.get("SENDER_DELAYED_ACK", "1"))
+
+SEQ_HEADER = struct.Struct(">i")
+FIN_TAG = b"fin"
+
+V2_MARK = 0x82
+SYN, ACK, FIN, DATA, PROBE = 0x01, 0x02, 0x04, 0x08, 0x10
+V2_HEADER = struct.Struct(">BBIQ")
+V2_OFFSET = struct.Struct(">Q")
+SYN_OPTIONS = struct.Struct(">HBB")
+STRIPE_OPTION = struct.Struct(">IHHQQ")
+V2_SACK_BLOCK = struct.Struct(">QQ")
+
+# (ack id, flags, SACK blocks), or None for a packet to ignore
+Ack = Optional[Tuple[int, int, List[Tuple[int, int]]]]
+
+
+class LegacyWire:
+    """The original framing; byte for byte what the senders always sent."""
+
+    __slots__ = ()
+
+    prefix = b""
+    offset_header = SEQ_HEADER
+
+    def parse_ack(self, packet: bytes) -> Ack:
+        ack_id = SEQ_HEADER.unpack_from(packet)[0]
+        if packet.startswith(FIN_TAG, SEQ_HEADER.size):
+            return ack_id, FIN, []
+        return ack_id, ACK, parse_sack_blocks(packet)
+
+    def eof(self, offset: int, digest: bytes = b"") -> bytes:
+        # the EOF marker must stay empty, so there is no room for the digest
+        return SEQ_HEADER.pack(offset)
+
+    def fin_ack(self, ack_id: int) -> bytes:
+        return SEQ_HEADER.pack(ack_id) + b"FIN/ACK"
+
+
+LEGACY = LegacyWire()
+
+
+class Session:
+    """One v2 session and the options the receiver granted for it."""
+
+    __slots__ = ("session_id", "mss", "sack_blocks", "delayed_ack", "prefix")
+
+    offset_header = V2_OFFSET
+
+    def __init__(self, session_id: int, mss: int, sack_blocks: int, delayed_ack: int):
+        self.session_id = session_id
+        self.mss = mss
+        self.sack_blocks = sack_blocks
+        self.delayed_ack = delayed_ack
+        # everything in a DATA header but the offset
+        self.prefix = V2_HEADER.pack(V2_MARK, DATA, session_id, 0)[:-V2_OFFSET.size]
+
+    def packet(self, flags: int, offset: int, payload: bytes = b"") -> bytes:
+        return V2_HEADER.pack(V2_MARK, flags, self.session_id, offset) + payload
+
+    def parse_ack(self, packet: bytes) -> Ack:
+        if len(packet) < V2_HEADER.size or packet[0] != V2_MARK:
+            return None
+        _, flags, session_id, ack_id = V2_HEADER.unpack_from(packet)
+        if session_id != self.session_id:
+            return None
+        size = V2_SACK_BLOCK.size
+        blocks = [V2_SACK_BLOCK.unpack_from(packet, i)
+                  for i in range(V2_HEADER.size, len(packet) - size + 1, size)]
+        return ack_id, flags, blocks
+
+    def eof(self, offset: int, digest: bytes = b"") -> bytes:
+        return self.packet(FIN, offset, digest)
+
+    def fin_ack(self, ack_id: int) -> bytes:
+        return self.packet(FIN | ACK, ack_id)
+
+
+def new_session_id() -> int:
+    return random.getrandbits(32)
+
+
+def make_syn(session_id: int, mss: int, stripe: bytes = b"") -> bytes:
+    options = SYN_OPTIONS.pack(mss, min(SACK_REQUEST, 255), max(min(DELAYED_ACK_REQUEST, 255), 1))
+    return V2_HEADER.pack(V2_MARK, SYN, session_id, 0) + options + stripe
+
+
+def parse_syn_ack(packet: bytes, session_id: int) -> Optional[Session]:
+    """Returns the session the receiver granted, or None if `packet` is not its SYN|ACK."""
+    if len(packet) < V2_HEADER.size + SYN_OPTIONS.size or packet[0] != V2_MARK:
+        return None
+    _, flags, received_id, _ = V2_HEADER.unpack_from(packet)
+    if received_id != session_id or flags != SYN | ACK:
+        return None
+    return Session(session_id, *SYN_OPTIONS.unpack_from(packet, V2_HEADER.size))
+
+
+def make_probe(probe_id: int, size: int) -> bytes:
+    header = V2_HEADER.pack(V2_MARK, PROBE, probe_id, size)
+    return header + bytes(size - len(header))
+
+
+def parse_probe_ack(packet: bytes, probe_id: int) -> Optional[int]:
+    """Returns the datagram size the receiver got, or None if `packet` is not an answer to our probes."""
+    if len(packet) < V2_HEADER.size or packet[0] != V2_MARK:
+        return None
+    _, flags, received_id, size = V2_HEADER.unpack_from(packet)
+    if received_id != probe_id or flags != PROBE | ACK:
+        return None
+    return size